@@ -1,9 +1,15 @@
 from collections import defaultdict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 from functools import wraps
 from typing import TYPE_CHECKING
+from typing import Iterable
+from typing import TypeVar
 
+from django.db import transaction
 from django.db.models import Model
+from django.db.models.expressions import RawSQL
 from django.db.transaction import atomic
 
 from eventsourcing.domain_events import AggregateEvent
@@ -13,32 +19,103 @@ if TYPE_CHECKING:
     from eventsourcing.models import AggregateEventModel
     from eventsourcing.models import AggregateModel
 
+A = TypeVar("A", bound="AggregateModel")
 
-class _Singleton(type):
-    _instances = {}
+_UNNEST_DELETE_THRESHOLD = 10_000
+"""
+The number of edited events above which the ids are sent as a single array parameter rather than an `IN` list, avoiding
+the cost of parsing a very long list of query parameters.
+"""
 
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
 
+_current_repository: ContextVar["AggregateRepository | None"] = ContextVar("aggregate_repository", default=None)
+"""
+The repository for the unit of work in the current context. Each thread and asyncio task has its own context, so
+concurrent units of work never share tracked aggregates or events.
+"""
+
+
+class NoUnitOfWorkException(Exception):
+    def get_message(self) -> str:
+        return "There is no unit of work in progress. Use `store_aggregate_changes` or `aggregate_store` to start one."
+
+
+class AggregateRepository:
+    @classmethod
+    def current(cls) -> "AggregateRepository":
+        """
+        Get the repository for the unit of work in progress in the current context.
+        """
+        if (repository := _current_repository.get()) is None:
+            raise NoUnitOfWorkException()
+
+        return repository
+
+    @classmethod
+    def get_or_none(cls) -> "AggregateRepository | None":
+        return _current_repository.get()
 
-class AggregateRepository(metaclass=_Singleton):
     def __init__(self):
         self._events = []
         self._new_aggregate_events: dict[AggregateModel, list[AggregateEvent]] = defaultdict(list)
         self._event_stores: dict[type[Model], list[AggregateEvent]] = defaultdict(list)
-        self._deleted_event_models: dict[type[Model], list[AggregateEventModel]] = defaultdict(list)
+        self._deleted_event_models: dict[type[Model], dict[int, AggregateEventModel]] = defaultdict(dict)
+        self._loaded_aggregates: dict[tuple[type[Model], str], AggregateModel] = {}
+        self._emitted_counts: dict[AggregateModel, int] = {}
+
+    def get(self, model_class: type[A], pk: str) -> A | None:
+        """
+        Get the current state of an aggregate by its primary key in this unit of work, or None if it does not exist.
+
+        An aggregate that has already been loaded or changed in this unit of work is returned as it is, including any changes
+        that have not been persisted yet, rather than loading it from the database again.
+        """
+        return self.get_many(model_class, [pk]).get(pk)
+
+    def get_many(self, model_class: type[A], pks: Iterable[str]) -> dict[str, A]:
+        """
+        Get the current state of each of the aggregates that exist by their primary keys, loading any not yet seen in this
+        unit of work with a single query.
+
+        The rows of the loaded aggregates are locked until the unit of work ends, so that concurrent units of work changing
+        the same aggregates wait for each other, rather than each replaying the aggregates only for all but one to fail
+        their version check when persisting.
+        """
+        aggregates = {}
+        missing_pks = []
+        for pk in pks:
+            if (aggregate := self._loaded_aggregates.get((model_class, pk))) is not None:
+                aggregates[pk] = aggregate
+            else:
+                missing_pks.append(pk)
+
+        if missing_pks:
+            # The rows are locked in primary key order, so that units of work locking some of the same aggregates cannot
+            # deadlock each other.
+            locked = model_class.objects.select_for_update().order_by("pk")
+            for pk, aggregate in locked.in_bulk(missing_pks).items():
+                self._loaded_aggregates[(model_class, pk)] = aggregate
+                aggregates[pk] = aggregate
+
+        return aggregates
 
     def add(self, aggregate):
-        new_events = self._new_aggregate_events[aggregate]
-        added_events = aggregate.get_recorded_events()[len(new_events) :]
+        # Only the events recorded since the aggregate was last added are new, so track how far through the aggregate's
+        # recorded events we are rather than comparing against a copy of them. The position is only kept on the aggregate
+        # once its events are persisted, so that they are added again by a later unit of work if this one fails.
+        recorded_events = aggregate.get_recorded_events()
+        added_events = recorded_events[self._emitted_counts.get(aggregate, aggregate._emitted_count) :]
+        self._emitted_counts[aggregate] = len(recorded_events)
+
+        event_model = aggregate.get_event_model()
+        self._new_aggregate_events[aggregate].extend(added_events)
+        self._event_stores[event_model].extend(added_events)
+        self._deleted_event_models[event_model].update((event.id, event) for event in aggregate.get_deleted_event_models())
 
-        self._new_aggregate_events[aggregate] += added_events
-        self._event_stores[aggregate.get_event_model()] += added_events
-        self._deleted_event_models[aggregate.get_event_model()] += aggregate.get_deleted_event_models()
+        self._events.extend(added_events)
 
-        self._events += added_events
+        # The changed aggregate is the current state of the aggregate for the rest of the unit of work.
+        self._loaded_aggregates[(type(aggregate), aggregate.pk)] = aggregate
 
     def mark_aggregate_event_edited(self, aggregate: "AggregateModel", event: "AggregateEventModel"):
         """
@@ -50,40 +127,106 @@ class AggregateRepository(metaclass=_Singleton):
             # Ensure each of the aggregates is marked as updated to be persisted
             self._new_aggregate_events[aggregate] = []
 
-        self._deleted_event_models[type(event)].append(event)
+        # The same event may be marked as edited multiple times, so only keep one per id
+        self._deleted_event_models[type(event)][event.id] = event
 
     def clear(self):
         self._events = []
         self._new_aggregate_events = defaultdict(list)
         self._event_stores = defaultdict(list)
-        self._deleted_event_models = defaultdict(list)
+        self._deleted_event_models = defaultdict(dict)
+        self._loaded_aggregates = {}
+        self._emitted_counts = {}
 
     def persist(self):
-        # Save the changes for each aggregate, incrementing the version as it goes to check for collisions.
+        # Save the changes for each type of aggregate together, incrementing the versions to check for collisions.
+        aggregates_by_type = defaultdict(list)
         for aggregate in self._new_aggregate_events.keys():
-            aggregate.persist()
+            aggregates_by_type[type(aggregate)].append(aggregate)
+
+        for model, aggregates in aggregates_by_type.items():
+            model.persist_many(aggregates)
 
         # Store the events into the persistent event store
         for event_model, events in self._event_stores.items():
             event_model.objects.store(events)
 
         for event_model, events in self._deleted_event_models.items():
-            if ids := [event.id for event in events]:
-                event_model.objects.filter(id__in=ids).delete()
+            if ids := list(events.keys()):
+                if len(ids) > _UNNEST_DELETE_THRESHOLD:
+                    event_model.objects.filter(id__in=RawSQL("SELECT unnest(%s)", (ids,))).delete()
+                else:
+                    event_model.objects.filter(id__in=ids).delete()
+
+        # Snapshots after any stored or removed events no longer represent the aggregate, so remove them before taking new
+        # snapshots of the aggregates at their latest state.
+        self._invalidate_snapshots()
+        self._take_snapshots()
 
-        # Publish the events as notifications on the event bus
-        get_notification_bus().dispatch_all(self._events)
+        for aggregate, emitted_count in self._emitted_counts.items():
+            aggregate._emitted_count = emitted_count
+
+        # Publish the events as notifications on the event bus once the transaction commits, so that slow subscribers do not
+        # hold the transaction and its row locks open. The events are copied since the repository is cleared below.
+        transaction.on_commit(partial(get_notification_bus().dispatch_all, list(self._events)))
 
         self.clear()
 
+    def _invalidate_snapshots(self):
+        snapshot_models = {}
+        for aggregate in self._new_aggregate_events.keys():
+            if (snapshot_model := aggregate.get_snapshot_model()) is not None:
+                snapshot_models[aggregate.get_event_model()] = snapshot_model
 
-def store_aggregate_changes(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        # Create the aggregate repository singleton for this unit of work
+        for event_model, snapshot_model in snapshot_models.items():
+            # Find the earliest change to each aggregate's event stream. Events without an `occurred_at` are stored at the
+            # current time, so they cannot come before any existing snapshot.
+            changed_events = [event for event in self._event_stores[event_model] if hasattr(event, "occurred_at")]
+            changed_events += self._deleted_event_models[event_model].values()
+
+            occurred_at_by_id = {}
+            for event in changed_events:
+                current = occurred_at_by_id.get(event.aggregate_id)
+                if current is None or event.occurred_at < current:
+                    occurred_at_by_id[event.aggregate_id] = event.occurred_at
+
+            snapshot_model.objects.invalidate_from(occurred_at_by_id)
+
+    def _take_snapshots(self):
+        to_snapshot = defaultdict(list)
+        for aggregate in self._new_aggregate_events.keys():
+            if aggregate.should_snapshot():
+                to_snapshot[aggregate.get_snapshot_model()].append(aggregate)
+
+        for snapshot_model, aggregates in to_snapshot.items():
+            snapshot_model.objects.take(aggregates)
+
+
+@contextmanager
+def _unit_of_work():
+    """
+    Enter a unit of work with a fresh repository, or join the unit of work already in progress in this context, within a
+    transaction.
+    """
+    aggregate_repository = _current_repository.get()
+    token = None
+    if aggregate_repository is None:
         aggregate_repository = AggregateRepository()
+        token = _current_repository.set(aggregate_repository)
 
+    try:
         with atomic():
+            yield aggregate_repository
+    finally:
+        if token is not None:
+            _current_repository.reset(token)
+
+
+def store_aggregate_changes(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        # Create the aggregate repository for this unit of work
+        with _unit_of_work() as aggregate_repository:
             try:
                 response = f(*args, **kwargs)
 
@@ -101,8 +244,7 @@ def store_aggregate_changes(f):
 
 @contextmanager
 def aggregate_store():
-    aggregate_repository = AggregateRepository()
-    with atomic():
+    with _unit_of_work() as aggregate_repository:
         try:
             yield aggregate_repository
             aggregate_repository.persist()
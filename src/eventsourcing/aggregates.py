@@ -1,22 +1,33 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
 from datetime import datetime
 from typing import Any
 from typing import Callable
 from typing import Iterable
+from typing import Iterator
 from typing import Type
 from typing import TypeVar
 
+from django.db import connections
 from django.db import transaction
+from django.db.models import Count
 from django.db.models import F
 from django.db.models import Q
+from django.db.models import QuerySet
+from django.db.transaction import TransactionManagementError
 
 from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.models import AggregateEventModel
 from eventsourcing.models import AggregateModel
+from eventsourcing.models import AggregateSnapshotModel
 from lib.db.iterators import cursor
 from lib.iter import chunk
 
 A = TypeVar("A", bound=AggregateModel)
 
+_REPLAY_CHUNK_SIZE = 2000
+
 
 def load_editable_aggregates_at_time_and_point(
     aggregates: Iterable[A],
@@ -28,7 +39,7 @@ def load_editable_aggregates_at_time_and_point(
     time.
 
     Any events that occurred on the aggregates with the provided sequence number will be marked for removal by the aggregate
-    repository.
+    repository, so this must be called within a unit of work.
 
     For any aggregates that already exist within the event store, newly initialized aggregates with the correct ID and version
     will be returned for each of the aggregates passed in. The provided aggregates must include all fields necessary to
@@ -37,31 +48,19 @@ def load_editable_aggregates_at_time_and_point(
     For aggregates that are not yet persisted, the aggregate will be marked for backdating and the original version, not a copy,
     will be returned. This is to ensure any aggregates already tracked by the AggregateRepository are not duplicated.
     """
-    event_store = None
-    aggregates_by_id = {}
-    for agg in aggregates:
-        event_store = event_store or agg.get_event_model()
-        if agg._state.adding:
-            # This is a new aggregate that has not been persisted yet. We want to keep using it but mark it for backdating
-            # since we are acting on the aggregate at a specific time in the past and the creation will be recorded at the
-            # time of insertion.
-            agg.mark_for_backdating()
-            aggregates_by_id[agg.get_aggregate_id()] = agg
-        else:
-            aggregates_by_id[agg.get_aggregate_id()] = agg.identity()
-
+    event_store, aggregates_by_id, snapshots = _editable_aggregates_before(aggregates, occurred_at)
     if not aggregates_by_id:
         return {}
 
-    repository = AggregateRepository()
+    repository = AggregateRepository.current()
 
-    events_after_and_including = event_store.objects.filter(aggregate_id__in=aggregates_by_id.keys()).filter(
+    events_after_and_including = event_store.objects.filter(_events_after_snapshots(aggregates_by_id.keys(), snapshots)).filter(
         Q(occurred_at__lt=occurred_at) | Q(occurred_at=occurred_at, sequence_number__lte=sequence_number)
     )
 
     # For all aggregates with events at or before the provided timestamp/sequence number, rebuild them using that information
-    rebuilt_aggregate_ids = set()
-    for event in events_after_and_including:
+    rebuilt_aggregate_ids = set(snapshots.keys())
+    for event in _stream_for_replay(events_after_and_including, "occurred_at"):
         if event.sequence_number == sequence_number:
             # Capture the particular sequence number we are reverting
             repository.mark_aggregate_event_edited(aggregates_by_id[event.aggregate_id], event)
@@ -72,17 +71,7 @@ def load_editable_aggregates_at_time_and_point(
     # For all aggregates that have not been rebuilt, we need to load the initial event for them and apply it.
     # These are aggregates that did not exist at this time, but we will be backdating the initial reference to.
     not_rebuilt_ids = set(aggregates_by_id.keys()) - rebuilt_aggregate_ids
-    initial_events_before = (
-        event_store.objects.filter(aggregate_id__in=not_rebuilt_ids)
-        .exclude(sequence_number=sequence_number)
-        .order_by("aggregate_id", "occurred_at", F("sequence_number").asc(nulls_first=True), "id")
-        .distinct("aggregate_id")
-    )
-
-    for event in initial_events_before:
-        aggregate = aggregates_by_id[event.aggregate_id]
-        aggregate.load(event.get_event_data())
-        aggregate.mark_for_backdating()
+    _load_initial_events(event_store, aggregates_by_id, not_rebuilt_ids, exclude=Q(sequence_number=sequence_number))
 
     return aggregates_by_id
 
@@ -92,8 +81,41 @@ def load_editable_aggregates_at_time(aggregates: Iterable[A], occurred_at: datet
     Load editable versions of the aggregates at the end of a specific point in time, returning persistable
     representations at the time, but after any events that may have occurred at the exact time.
     """
+    event_store, aggregates_by_id, snapshots = _editable_aggregates_before(aggregates, occurred_at)
+    if not aggregates_by_id:
+        return {}
+
+    events_before_or_including = event_store.objects.filter(_events_after_snapshots(aggregates_by_id.keys(), snapshots)).filter(
+        occurred_at__lte=occurred_at
+    )
+
+    # For all aggregates with events at or before the provided timestamp, rebuild them using that information
+    rebuilt_aggregate_ids = set(snapshots.keys())
+    for aggregate_id, event in _replay_event_data(event_store, events_before_or_including):
+        rebuilt_aggregate_ids.add(aggregate_id)
+        aggregates_by_id[aggregate_id].load(event)
+
+    # For all aggregates that have not been rebuilt, we need to load the initial event for them and apply it.
+    # These are aggregates that did not exist at this time, but we will be backdating the initial reference to.
+    not_rebuilt_ids = set(aggregates_by_id.keys()) - rebuilt_aggregate_ids
+    _load_initial_events(event_store, aggregates_by_id, not_rebuilt_ids)
+
+    return aggregates_by_id
+
+
+def _editable_aggregates_before(
+    aggregates: Iterable[A], occurred_at: datetime
+) -> tuple[Type[AggregateEventModel] | None, dict[str, A], dict[str, AggregateSnapshotModel]]:
+    """
+    Prepare editable versions of the aggregates to be rebuilt up to a point in time, returning their event store, the
+    aggregates by ID, and the snapshots already loaded onto them by aggregate ID.
+
+    Persisted aggregates are replaced by their identities and start from their latest snapshot before the time, if there is
+    one, so that only the events between the snapshot and the time need to be replayed.
+    """
     event_store = None
     aggregates_by_id = {}
+    persisted_by_id = {}
     for agg in aggregates:
         event_store = event_store or agg.get_event_model()
         if agg._state.adding:
@@ -103,36 +125,14 @@ def load_editable_aggregates_at_time(aggregates: Iterable[A], occurred_at: datet
             agg.mark_for_backdating()
             aggregates_by_id[agg.get_aggregate_id()] = agg
         else:
-            aggregates_by_id[agg.get_aggregate_id()] = agg.identity()
+            aggregates_by_id[agg.get_aggregate_id()] = persisted_by_id[agg.get_aggregate_id()] = agg.identity()
 
-    if not aggregates_by_id:
-        return {}
+    snapshots = {}
+    if persisted_by_id:
+        model_class = type(next(iter(persisted_by_id.values())))
+        snapshots = _load_snapshots(model_class, persisted_by_id, before=occurred_at)
 
-    events_before_or_including = event_store.objects.filter(aggregate_id__in=aggregates_by_id.keys()).filter(
-        occurred_at__lte=occurred_at
-    )
-
-    # For all aggregates with events at or before the provided timestamp/sequence number, rebuild them using that information
-    rebuilt_aggregate_ids = set()
-    for event in events_before_or_including:
-        rebuilt_aggregate_ids.add(event.aggregate_id)
-        aggregates_by_id[event.aggregate_id].load(event.get_event_data())
-
-    # For all aggregates that have not been rebuilt, we need to load the initial event for them and apply it.
-    # These are aggregates that did not exist at this time, but we will be backdating the initial reference to.
-    not_rebuilt_ids = set(aggregates_by_id.keys()) - rebuilt_aggregate_ids
-    initial_events_before = (
-        event_store.objects.filter(aggregate_id__in=not_rebuilt_ids)
-        .order_by("aggregate_id", "occurred_at", F("sequence_number").asc(nulls_first=True), "id")
-        .distinct("aggregate_id")
-    )
-
-    for event in initial_events_before:
-        aggregate = aggregates_by_id[event.aggregate_id]
-        aggregate.load(event.get_event_data())
-        aggregate.mark_for_backdating()
-
-    return aggregates_by_id
+    return event_store, aggregates_by_id, snapshots
 
 
 def load_aggregate_states_before(
@@ -170,7 +170,9 @@ def load_aggregate_states_before(
         identity._persistable = False
         identities[reloaded_agg.get_aggregate_id()] = identity
 
-    aggregate_events = event_store.objects.filter(aggregate_id__in=identities.keys())
+    # Start from the latest snapshot before the time, if there is one, and only replay the events after it.
+    snapshots = _load_snapshots(model, identities, before=occurred_at)
+    aggregate_events = event_store.objects.filter(_events_after_snapshots(identities.keys(), snapshots))
 
     sequence_filter = Q(occurred_at__lt=occurred_at)
     if sequence_number is not None:
@@ -178,25 +180,17 @@ def load_aggregate_states_before(
 
     events_before = aggregate_events.filter(sequence_filter)
 
-    # For all aggregates with events before the provided timestamp/sequence number, rebuild them using that information
-    rebuilt_aggregate_ids = set()
-    for event in events_before:
-        rebuilt_aggregate_ids.add(event.aggregate_id)
-        identities[event.aggregate_id].load(event.get_event_data())
+    # For all aggregates with events before the provided timestamp/sequence number, rebuild them using that information.
+    # Aggregates with a snapshot before the time already existed, so they never need their initial event.
+    rebuilt_aggregate_ids = set(snapshots.keys())
+    for aggregate_id, event in _replay_event_data(event_store, events_before):
+        rebuilt_aggregate_ids.add(aggregate_id)
+        identities[aggregate_id].load(event)
 
     # For all aggregates that have not been rebuilt, we need to load the initial event for them and apply it.
     # These are aggregates that did not exist at this time, but we will be backdating the initial reference to.
     not_rebuilt_ids = set(identities.keys()) - rebuilt_aggregate_ids
-    first_events_after = (
-        event_store.objects.filter(aggregate_id__in=not_rebuilt_ids)
-        .order_by("aggregate_id", "occurred_at", F("sequence_number").asc(nulls_first=True), "id")
-        .distinct("aggregate_id")
-    )
-
-    for event in first_events_after:
-        aggregate = identities[event.aggregate_id]
-        aggregate.load(event.get_event_data())
-        aggregate.mark_for_backdating()
+    _load_initial_events(event_store, identities, not_rebuilt_ids)
 
     return identities
 
@@ -208,10 +202,25 @@ def rebuild_aggregates(
     prebuild_callback: Callable[[int], None] = None,
     chunk_callback: Callable[[int], None] = None,
     model_id: Any | None = None,
+    workers: int = 1,
+    events_per_chunk: int | None = None,
 ):
-    event_model: Type[AggregateEventModel] = model_class.get_event_model()
+    """
+    Rebuild the aggregates from their events in chunks.
 
-    all_instances = model_class.objects.all().only("pk", "version")
+    Each aggregate's events are independent of the others, so with more than one worker the chunks are rebuilt in parallel
+    by separate processes, each with its own database connection. The connections of this process are closed before the
+    workers are started, so rebuilding with more than one worker cannot be done inside a transaction.
+
+    By default each chunk holds `chunk_size` aggregates. When `events_per_chunk` is provided, chunks are instead closed once
+    their aggregates have about that many events between them, up to `chunk_size` aggregates, so that aggregates with long
+    histories do not make some chunks far slower than others.
+    """
+    if workers > 1 and any(connection.in_atomic_block for connection in connections.all(initialized_only=True)):
+        # The connections are closed before forking the workers, which would end the transaction of the caller.
+        raise TransactionManagementError("Aggregates cannot be rebuilt with more than one worker inside a transaction.")
+
+    all_instances = model_class.objects.all()
 
     if model_id:
         all_instances = all_instances.filter(id=model_id)
@@ -220,40 +229,190 @@ def rebuild_aggregates(
         total = all_instances.count()
         prebuild_callback(total)
 
-    index = 1
+    if events_per_chunk:
+        chunks = _chunk_by_event_count(model_class, all_instances, chunk_size, events_per_chunk)
+    else:
+        chunks = (
+            [(row["pk"], row["version"]) for row in rows]
+            for rows in chunk(cursor(all_instances, "pk", values=["version"]), chunk_size)
+        )
+
+    if workers <= 1:
+        for index, keys in enumerate(chunks, start=1):
+            _rebuild_chunk(model_class, keys)
+            if chunk_callback:
+                chunk_callback(index)
+        return
+
+    # Read all the keys before forking, then close the connections so that the workers never share a connection with this
+    # process and each opens its own.
+    chunks = list(chunks)
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        futures = [executor.submit(_rebuild_chunk, model_class, keys) for keys in chunks]
+        for index, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            if chunk_callback:
+                chunk_callback(index)
+
+
+def _chunk_by_event_count(
+    model_class: Type[A], instances: QuerySet, chunk_size: int, events_per_chunk: int
+) -> Iterator[list[tuple[Any, int]]]:
+    """
+    Group the primary keys and versions of the aggregates into chunks with about `events_per_chunk` events each.
+    """
+    event_model: Type[AggregateEventModel] = model_class.get_event_model()
+
+    keys = []
+    event_count = 0
+    for page in chunk(cursor(instances, "pk", values=["version"]), chunk_size):
+        counts = dict(
+            event_model.objects.filter(aggregate_id__in=[row["pk"] for row in page])
+            .values("aggregate_id")
+            .annotate(count=Count("id"))
+            .values_list("aggregate_id", "count")
+        )
+
+        for row in page:
+            keys.append((row["pk"], row["version"]))
+            event_count += counts.get(row["pk"], 0)
+            if event_count >= events_per_chunk or len(keys) >= chunk_size:
+                yield keys
+                keys = []
+                event_count = 0
+
+    if keys:
+        yield keys
+
+
+def _rebuild_chunk(model_class: Type[A], keys: list[tuple[Any, int]]):
+    """
+    Rebuild and persist a chunk of aggregates, provided as their primary keys and current versions.
+    """
+    event_model: Type[AggregateEventModel] = model_class.get_event_model()
+
+    rebuilt_instances = {}
+    for pk, version in keys:
+        rebuilt_instances[pk] = model_class(pk=pk, version=version).identity()
+
+    snapshots = _load_snapshots(model_class, rebuilt_instances)
+    events = event_model.objects.filter(_events_after_snapshots(list(rebuilt_instances.keys()), snapshots))
+    for aggregate_id, event in _replay_event_data(event_model, events):
+        rebuilt_instances[aggregate_id].load(event)
+
+    with transaction.atomic():
+        for instance in rebuilt_instances.values():
+            instance.persist()
+
+
+def _replay_order(events: QuerySet) -> QuerySet:
+    return events.order_by("aggregate_id", "occurred_at", F("sequence_number").asc(nulls_first=True), "id")
+
+
+def _stream_for_replay(events: QuerySet, *fields: str) -> Iterator[AggregateEventModel]:
+    """
+    Stream the events grouped by aggregate and in stream order, fetching only the fields needed to replay them.
+
+    Streaming avoids holding every event in memory at once when aggregates have long histories.
+    """
+    return (
+        _replay_order(events)
+        .only("aggregate_id", "event_type", "event_data", "sequence_number", *fields)
+        .iterator(chunk_size=_REPLAY_CHUNK_SIZE)
+    )
+
+
+def _replay_event_data(event_model: Type[AggregateEventModel], events: QuerySet, *fields: str) -> Iterator[tuple]:
+    """
+    Stream the aggregate ID and validated event of each event in stream order, followed by the values of any extra fields,
+    for replays that only load events.
+
+    The rows are fetched as values, skipping the cost of instantiating an event model for every row.
+    """
+    rows = _replay_order(events).values_list("aggregate_id", "event_type", event_model.event_data_json(), *fields)
+    for aggregate_id, event_type, event_data, *values in rows.iterator(chunk_size=_REPLAY_CHUNK_SIZE):
+        yield aggregate_id, event_model.parse_event_data(event_type, event_data), *values
+
+
+def _load_initial_events(
+    event_store: Type[AggregateEventModel],
+    aggregates_by_id: dict[str, A],
+    aggregate_ids: Iterable[str],
+    exclude: Q | None = None,
+):
+    """
+    Load the first event onto each of the aggregates that did not exist at the point they were rebuilt to, marking them for
+    backdating.
+    """
+    if not aggregate_ids:
+        return
 
-    for chunk_instances in chunk(cursor(all_instances, "pk"), chunk_size):
-        rebuilt_instances = {}
-        ids = []
-        for instance in chunk_instances:
-            rebuilt_instances[instance.pk] = instance.identity()
-            ids.append(instance.pk)
+    initial_events = event_store.objects.filter(aggregate_id__in=aggregate_ids)
+    if exclude is not None:
+        initial_events = initial_events.exclude(exclude)
 
-        events = event_model.objects.filter(aggregate_id__in=ids)
-        for event in events:
-            rebuilt_instances[event.aggregate_id].load(event.get_event_data())
+    for aggregate_id, event in _replay_event_data(event_store, initial_events.distinct("aggregate_id")):
+        aggregates_by_id[aggregate_id].load(event)
+        aggregates_by_id[aggregate_id].mark_for_backdating()
 
-        with transaction.atomic():
-            for instance in rebuilt_instances.values():
-                instance.persist()
 
-        if chunk_callback:
-            chunk_callback(index)
-        index += 1
+def _load_snapshots(
+    model_class: Type[A], aggregates_by_id: dict[str, A], before: datetime | None = None
+) -> dict[str, AggregateSnapshotModel]:
+    """
+    Load the latest snapshot of each aggregate onto it, returning the snapshots that were used by aggregate ID.
+    """
+    snapshot_model = model_class.get_snapshot_model()
+    if snapshot_model is None:
+        return {}
+
+    snapshots = snapshot_model.objects.latest_for(
+        aggregates_by_id.keys(), snapshot_version=model_class.snapshot_version, before=before
+    )
+    for aggregate_id, snapshot in snapshots.items():
+        aggregates_by_id[aggregate_id].load_snapshot(snapshot.state_data)
+
+    return snapshots
+
+
+def _events_after_snapshots(aggregate_ids: Iterable[str], snapshots: dict[str, AggregateSnapshotModel]) -> Q:
+    """
+    Build a filter for the events of the aggregates, excluding any events already included in the aggregates' snapshots.
+    """
+    events_filter = Q(aggregate_id__in=[aggregate_id for aggregate_id in aggregate_ids if aggregate_id not in snapshots])
+    for snapshot in snapshots.values():
+        events_filter |= snapshot.events_after()
+
+    return events_filter
 
 
 def reapply_downstream_events_from(aggregate: AggregateModel, occurred_at: datetime, sequence_number: str):
     """
     Reapply all events that occurred after the given timestamp and sequence number.
     """
+    reapply_downstream_events_from_many([aggregate], occurred_at, sequence_number)
+
+
+def reapply_downstream_events_from_many(aggregates: Iterable[AggregateModel], occurred_at: datetime, sequence_number: str):
+    """
+    Reapply all events that occurred after the given timestamp and sequence number onto each of the aggregates, fetching
+    the events of all the aggregates in a single query.
+
+    The aggregates must share an event store.
+    """
+    aggregates_by_id = {aggregate.get_aggregate_id(): aggregate for aggregate in aggregates}
+    if not aggregates_by_id:
+        return
+
     # Find all the events that come after any events matching the occurred_at and sequence_number
-    events = (
-        aggregate.get_event_model()
-        .objects.filter(aggregate_id=aggregate.get_aggregate_id())
-        .filter(Q(occurred_at__gt=occurred_at) | Q(occurred_at=occurred_at, sequence_number__gt=sequence_number))
+    event_model = next(iter(aggregates_by_id.values())).get_event_model()
+    events = event_model.objects.filter(aggregate_id__in=aggregates_by_id.keys()).filter(
+        Q(occurred_at__gt=occurred_at) | Q(occurred_at=occurred_at, sequence_number__gt=sequence_number)
     )
 
     # Reapply each downstream event back onto the new state of the aggregate to build the latest current state to be
     # persisted by the AggregateRepository.
-    for event in events:
-        aggregate.load(event.get_event_data())
+    for aggregate_id, event in _replay_event_data(event_model, events):
+        aggregates_by_id[aggregate_id].load(event)
@@ -5,3 +5,9 @@ class EventsourcingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "eventsourcing"
     label = "eventsourcing"
+
+    def ready(self):
+        from eventsourcing.notification_bus import get_notification_bus
+
+        # Import and create the notification subscribers on start up rather than on the first dispatch.
+        get_notification_bus().boot()
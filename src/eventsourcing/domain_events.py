@@ -11,7 +11,23 @@ from eventsourcing.notification_bus import Notification
 V = TypeVar("V")
 
 
+def camel_to_snake(name: str) -> str:
+    """
+    Convert a pascal case string (class name) into a snake case string, placing an underscore before every capital letter
+    other than the first.
+    """
+    chars = []
+    for i, char in enumerate(name):
+        if i > 0 and "A" <= char <= "Z":
+            chars.append("_")
+        chars.append(char)
+
+    return "".join(chars).lower()
+
+
 class ValueChange(BaseModel, Generic[V]):
+    model_config = ConfigDict(frozen=True)
+
     before: V
     after: V
 
@@ -27,6 +43,18 @@ class AggregateEvent(BaseModel, Notification):
         frozen=True,  # faux-immutable
     )
 
+    handler_name: ClassVar[str] = "aggregate_event"
+    """
+    The snake case name of the event class, used to find the `apply_` and `validate_` functions for the event on aggregates.
+    """
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+
+        # Compute the name once per event class rather than for every event that is applied.
+        cls.handler_name = camel_to_snake(cls.__name__)
+
 
 class Timestamped(BaseModel):
     occurred_at: datetime
@@ -10,6 +10,14 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("model", type=str, help="The model to rebuild in 'app_label.Model' format.")
         parser.add_argument("--id", type=str, help="(Optional) The specific model ID to rebuild.")
+        parser.add_argument(
+            "--workers", type=int, default=1, help="(Optional) The number of processes to rebuild chunks with in parallel."
+        )
+        parser.add_argument(
+            "--events-per-chunk",
+            type=int,
+            help="(Optional) Size the chunks by the number of events of their aggregates rather than only the number of aggregates.",
+        )
 
     def handle(self, *args, **options):
         model = options["model"]
@@ -29,10 +37,20 @@ class Command(BaseCommand):
             total = t
 
         def chunk_cb(i):
-            self.stdout.write(f"Rebuilt chunk #{i} of {total // chunk_size + 1}.")
+            if options["events_per_chunk"]:
+                # The number of chunks depends on the number of events of each aggregate, so it is not known up front
+                self.stdout.write(f"Rebuilt chunk #{i}.")
+            else:
+                self.stdout.write(f"Rebuilt chunk #{i} of {total // chunk_size + 1}.")
 
         rebuild_aggregates(
-            model_class, chunk_size=chunk_size, prebuild_callback=prebuild_cb, chunk_callback=chunk_cb, model_id=id
+            model_class,
+            chunk_size=chunk_size,
+            prebuild_callback=prebuild_cb,
+            chunk_callback=chunk_cb,
+            model_id=id,
+            workers=options["workers"],
+            events_per_chunk=options["events_per_chunk"],
         )
 
         self.stdout.write("Rebuild complete.")
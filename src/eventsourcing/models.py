@@ -1,12 +1,21 @@
 import logging
-import re
 import uuid
+from datetime import datetime
+from typing import Callable
+from typing import Iterable
 from typing import Self
 
 import ulid
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
 from django.db import models
+from django.db import transaction
 from django.db.models import F
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
 from django.db.models.functions import Now
 from django.utils import timezone
 
@@ -17,15 +26,20 @@ from eventsourcing.notification_bus import get_notification_bus
 logger = logging.getLogger(__name__)
 
 
-_class_to_func_pattern = re.compile(r"(?<!^)(?=[A-Z])")
+_UNNEST_INSERT_THRESHOLD = 5000
 """
-A regular expression for splitting a pascal case string (class name) into chunks. These chunks can then be combined using
-underscores to create a snake case string.
-
-This is compiled once on import for all uses in the future.
+The number of events above which they are inserted from arrays with `unnest` rather than a list of values.
 """
 
 
+def get_bulk_batch_size() -> int:
+    """
+    The number of rows written per query when aggregates and events are persisted in bulk, configured with the
+    `EVENTSOURCING_BULK_BATCH_SIZE` setting.
+    """
+    return getattr(settings, "EVENTSOURCING_BULK_BATCH_SIZE", 500)
+
+
 class OutOfDateVersionException(Exception):
     def __init__(self, model_name: str):
         self.model_name = model_name
@@ -43,12 +57,16 @@ class CannotPersistAggregateView(Exception):
 
 
 class AggregateModelManagerMixin:
-    def bulk_persist(self, instances: list["AggregateModel"]):
+    def bulk_persist(self, instances: list["AggregateModel"], batch_size: int | None = None):
+        batch_size = batch_size or get_bulk_batch_size()
         events = [event for instance in instances for event in instance.get_recorded_events()]
-        self.model.get_event_model().objects.store(events)
 
-        self.bulk_create(instances)
-        get_notification_bus().dispatch_all(events)
+        with transaction.atomic():
+            self.model.get_event_model().objects.store(events, batch_size=batch_size)
+            self.bulk_create(instances, batch_size=batch_size)
+
+            # Only publish the notifications once the events and aggregates are committed
+            transaction.on_commit(lambda: get_notification_bus().dispatch_all(events))
 
 
 class AggregateModelManager(AggregateModelManagerMixin, models.Manager):
@@ -59,9 +77,56 @@ class AggregateModel(models.Model):
     id = models.CharField(primary_key=True, max_length=26, editable=False)
     version = models.PositiveIntegerField(editable=False)
 
+    snapshot_every_versions = 100
+    """
+    Snapshot the aggregate each time it is persisted with a version that is a multiple of this value.
+
+    The version is incremented once per persist, however many events were recorded, so this counts units of work on the
+    aggregate rather than events.
+    """
+
+    snapshot_version = 1
+    """
+    The version of the snapshot format for the aggregate.
+
+    This must be incremented whenever the fields of the aggregate or the way events are applied change, so that existing
+    snapshots are ignored and the aggregate is rebuilt from its events.
+    """
+
+    _event_handlers: dict[type[AggregateEvent], tuple[Callable, Callable | None]] = {}
+    """
+    The apply and context validation functions for each event class, resolved once for each aggregate class.
+
+    Resolving these from the event class name for every event adds up when replaying long event streams.
+    """
+
     class Meta:
         abstract = True
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._recorded_events: list[AggregateEvent] = []
+        self._emitted_count = 0
+        self._deleted_event_models: list[AggregateEventModel] = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Build the handler table for the aggregate from the event types of its event store at class creation.
+        cls._event_handlers = {}
+        try:
+            event_types = getattr(cls.get_event_model(), "event_types", ())
+        except ImproperlyConfigured:
+            event_types = ()
+
+        for event_class in event_types:
+            try:
+                cls._resolve_event_handlers(event_class)
+            except NotImplementedError:
+                # Not every event in the store needs to be handled by every aggregate class, for example abstract ones.
+                pass
+
     def confirm_version(self, version):
         if self.version != version:
             raise OutOfDateVersionException(self.__class__._meta.verbose_name)
@@ -80,6 +145,11 @@ class AggregateModel(models.Model):
             "The event model must be set on the Aggregate or the get_event_model function should be overwritten."
         )
 
+    @classmethod
+    def get_snapshot_model(cls) -> type["AggregateSnapshotModel"] | None:
+        """Returns the snapshot model for the aggregate, or None if the aggregate is not snapshotted."""
+        return getattr(cls, "snapshot_model", None)
+
     def get_events_queryset(self, aggregate_id: str | None = None) -> models.QuerySet[AggregateEvent]:
         """Returns a queryset of aggregate events for the aggregate."""
         # Sometimes (inventory line items) the aggregate id is not the same as the pk.
@@ -111,8 +181,10 @@ class AggregateModel(models.Model):
         self.load(event)
 
         self.get_recorded_events().append(event)
-        if self.is_persistable():
-            AggregateRepository().add(self)
+        # Outside of a unit of work the events are only recorded on the aggregate, to be picked up by the repository if the
+        # aggregate is later changed inside one.
+        if self.is_persistable() and (repository := AggregateRepository.get_or_none()) is not None:
+            repository.add(self)
 
     def load(self, event: AggregateEvent):
         """
@@ -125,8 +197,17 @@ class AggregateModel(models.Model):
         * reapplying downstream events after an edit to calculate the aggregates new current state
         * replaying events to create a view of the aggregate at a point in time
         """
-        self._validate_event_context(event)
-        self._apply_event(event)
+        # This is `_validate_event_context` followed by `_apply_event`, looking up the handlers for the event only once. The
+        # handler table is read directly since this runs for every event replayed.
+        handlers = self._event_handlers.get(type(event))
+        if handlers is None:
+            handlers = self._resolve_event_handlers(type(event))
+        apply_fn, validate_fn = handlers
+
+        if validate_fn is not None:
+            validate_fn(self, event)
+
+        apply_fn(self, event)
 
     def _is_before_creation(self) -> bool:
         return getattr(self, "__is_before_creation__", False)
@@ -160,20 +241,40 @@ class AggregateModel(models.Model):
         An example of how this might function is to check that when applying or reapplying a `SkuInventoryAdded` event,
         the total units of the SKU in the inventory do not exceed the maximum units allowed for the SKU.
         """
-        name = _class_to_func_pattern.sub("_", event.__class__.__name__).lower()
-        fn_name = f"validate_{name}_context"
+        _, validate_fn = self._get_event_handlers(event)
 
-        if hasattr(self, fn_name):
-            getattr(self, fn_name)(event)
+        if validate_fn is not None:
+            validate_fn(self, event)
 
     def _apply_event(self, event: AggregateEvent):
-        name = _class_to_func_pattern.sub("_", event.__class__.__name__).lower()
+        apply_fn, _ = self._get_event_handlers(event)
+
+        apply_fn(self, event)
+
+    def _get_event_handlers(self, event: AggregateEvent) -> tuple[Callable, Callable | None]:
+        """
+        Find the apply function and the optional context validation function for the event.
+        """
+        try:
+            return self._event_handlers[type(event)]
+        except KeyError:
+            return self._resolve_event_handlers(type(event))
+
+    @classmethod
+    def _resolve_event_handlers(cls, event_class: type[AggregateEvent]) -> tuple[Callable, Callable | None]:
+        """
+        Resolve the handler functions for the event class from its name and store them in the aggregate's handler table.
+        """
+        name = event_class.handler_name
         fn_name = f"apply_{name}"
 
-        if not hasattr(self, fn_name):
+        if not hasattr(cls, fn_name):
             raise NotImplementedError(f"Event handling method named {fn_name} not implemented")
 
-        getattr(self, fn_name)(event)
+        handlers = (getattr(cls, fn_name), getattr(cls, f"validate_{name}_context", None))
+        cls._event_handlers[event_class] = handlers
+
+        return handlers
 
     def persist(self):
         if hasattr(self, "_persistable") and not self._persistable:
@@ -189,24 +290,94 @@ class AggregateModel(models.Model):
             current_version = self.version
             self.version += 1
             updated_rows = self.__class__.objects.filter(pk=self.pk, version=current_version).update(
-                **{field.name: getattr(self, field.name) for field in self._meta.fields if field.editable}
+                version=self.version,
+                **{field.name: getattr(self, field.name) for field in self._meta.fields if field.editable},
             )
             if updated_rows == 0:
                 raise OutOfDateVersionException(self.__class__._meta.verbose_name)
 
+    @classmethod
+    def persist_many(cls, aggregates: list[Self], batch_size: int | None = None):
+        """
+        Persist many aggregates of this type together.
+
+        New aggregates are inserted and existing aggregates are updated in batches, rather than with a query per aggregate.
+        The versions of the existing aggregates are checked against the database, with the rows locked, before they are
+        updated, so this must be called within a transaction. Each aggregate may only be given once, as the versions are
+        checked by primary key.
+
+        Aggregates that override `persist` are persisted one at a time so that their custom behavior is kept.
+        """
+        if cls.persist is not AggregateModel.persist:
+            for aggregate in aggregates:
+                aggregate.persist()
+            return
+
+        batch_size = batch_size or get_bulk_batch_size()
+
+        for aggregate in aggregates:
+            if not aggregate.is_persistable():
+                raise CannotPersistAggregateView(cls._meta.verbose_name)
+
+        pks = [aggregate.pk for aggregate in aggregates]
+        if len(set(pks)) != len(pks):
+            raise ValueError(f"Cannot persist the same {cls._meta.verbose_name} more than once in a batch.")
+
+        created = [aggregate for aggregate in aggregates if aggregate._state.adding]
+        updated = [aggregate for aggregate in aggregates if not aggregate._state.adding]
+
+        if updated:
+            expected_versions = {aggregate.pk: aggregate.version for aggregate in updated}
+            current_versions = dict(
+                cls.objects.filter(pk__in=expected_versions.keys()).select_for_update().values_list("pk", "version")
+            )
+            if current_versions != expected_versions:
+                raise OutOfDateVersionException(cls._meta.verbose_name)
+
+            for aggregate in updated:
+                aggregate.version += 1
+
+            fields = ["version", *[field.name for field in cls._meta.fields if field.editable]]
+            cls.objects.bulk_update(updated, fields=fields, batch_size=batch_size)
+
+        if created:
+            for aggregate in created:
+                aggregate.version = 1
+
+            cls.objects.bulk_create(created, batch_size=batch_size)
+
+    def should_snapshot(self) -> bool:
+        return self.get_snapshot_model() is not None and self.version % self.snapshot_every_versions == 0
+
+    def save_snapshot(self) -> dict:
+        """
+        Serialize the state of the aggregate into a JSON-compatible dictionary.
+
+        Only the editable fields are included. The identity fields are expected to be restored using `identity`.
+        """
+        data = {}
+        for field in self._meta.concrete_fields:
+            if field.editable:
+                data[field.attname] = None if field.value_from_object(self) is None else field.value_to_string(self)
+
+        return data
+
+    def load_snapshot(self, data: dict):
+        """
+        Restore the state of the aggregate from a dictionary created by `save_snapshot`.
+        """
+        for field in self._meta.concrete_fields:
+            if field.attname in data:
+                value = data[field.attname]
+                setattr(self, field.attname, None if value is None else field.to_python(value))
+
     def is_persistable(self) -> bool:
         return not hasattr(self, "_persistable") or self._persistable
 
     def get_recorded_events(self) -> list[AggregateEvent]:
-        if not hasattr(self, "_recorded_events"):
-            self._recorded_events = []
-
         return self._recorded_events
 
     def get_deleted_event_models(self) -> list["AggregateEventModel"]:
-        if not hasattr(self, "_deleted_event_models"):
-            self._deleted_event_models = []
-
         return self._deleted_event_models
 
     def save(self, *args, **kwargs):
@@ -215,20 +386,55 @@ class AggregateModel(models.Model):
 
 
 class EventStoreManagerMixin:
-    def store(self, events: list[AggregateEvent]):
+    def store(self, events: list[AggregateEvent], batch_size: int | None = None):
+        # Events without an occurred_at are stored as occurring now. The time is read once for the whole batch rather than
+        # for every event, since the default of `getattr` is evaluated even when the event has the attribute.
+        now = timezone.now()
         instances = []
         for event in events:
             instances.append(
                 self.model(
                     aggregate_id=event.aggregate_id,
                     event_type=event.event_type,
-                    event_data=event.model_dump(mode="json"),
-                    occurred_at=getattr(event, "occurred_at", timezone.now()),
+                    # Serialize the event straight to JSON and cast it in the database, rather than dumping it to a dict that
+                    # is then encoded again by the JSON field.
+                    event_data=RawSQL("%s::jsonb", (event.model_dump_json(),), output_field=models.JSONField()),
+                    occurred_at=getattr(event, "occurred_at", now),
                     sequence_number=getattr(event, "sequence_number", None),
                 )
             )
 
-        self.bulk_create(instances)
+        if len(instances) > _UNNEST_INSERT_THRESHOLD:
+            self._insert_with_unnest(instances)
+        else:
+            self.bulk_create(instances, batch_size=batch_size or get_bulk_batch_size())
+
+    def _insert_with_unnest(self, instances: list["AggregateEventModel"]):
+        """
+        Insert the events with a single array parameter per column, which Postgres parses much faster than a long list of
+        values. The IDs of the inserted events are not returned.
+        """
+        connection = connections[self.db]
+        fields = [
+            self.model._meta.get_field(name)
+            for name in ("aggregate_id", "event_type", "event_data", "occurred_at", "sequence_number")
+        ]
+
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        arrays = ", ".join(f"%s::{field.cast_db_type(connection)}[]" for field in fields)
+        params = []
+        for field in fields:
+            if field.name == "event_data":
+                # The serialized JSON of each event is cast to jsonb with the array.
+                params.append([instance.event_data.params[0] for instance in instances])
+            else:
+                params.append([field.get_db_prep_save(getattr(instance, field.attname), connection) for instance in instances])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {connection.ops.quote_name(self.model._meta.db_table)} ({columns}) SELECT * FROM unnest({arrays})",
+                params,
+            )
 
 
 class AggregateEventModelQuerySet(models.QuerySet):
@@ -242,7 +448,7 @@ class AggregateEventModelManager(EventStoreManagerMixin, models.Manager.from_que
 
 class AggregateEventOrderingMixin:
     """
-    A Meta class mixin defining the default aggregate event ordering.
+    A Meta class mixin defining the default aggregate event ordering and the index used to replay events in that order.
 
     This mixin should be used in the Meta class of a child of the AggregateEventModel to define the default ordering of
     events. This is required because non-abstract child models will not inherit the `ordering` key of an abstract parent
@@ -259,9 +465,21 @@ class AggregateEventOrderingMixin:
 
     ordering = ["occurred_at", F("sequence_number").asc(nulls_first=True), "id"]
 
+    indexes = [
+        # Matches the order events are replayed in, so that reading an aggregate's event stream is an index range scan
+        # without a sort.
+        models.Index(
+            "aggregate_id",
+            "occurred_at",
+            F("sequence_number").asc(nulls_first=True),
+            "id",
+            name="%(class)s_replay_idx",
+        ),
+    ]
+
 
 class AggregateEventModel(models.Model):
-    aggregate_id = models.CharField(db_index=True)
+    aggregate_id = models.CharField()
     event_type = models.CharField()
     event_data = models.JSONField()
     created_at = models.DateTimeField(auto_created=True, db_default=Now())
@@ -273,20 +491,161 @@ class AggregateEventModel(models.Model):
     class Meta(AggregateEventOrderingMixin):
         abstract = True
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Build the lookup of event classes by type once when the event store is created.
+        if hasattr(cls, "event_types"):
+            cls.event_types_dict = {c.event_type: c for c in cls.event_types}
+
     @classmethod
     def get_event_class(cls, event_type) -> type[AggregateEvent]:
-        if not hasattr(cls, "event_types"):
+        try:
+            return cls.event_types_dict[event_type]
+        except AttributeError:
             raise ImproperlyConfigured(
                 "The event_types attribute must be set on the AggregateEventModel or override `get_event_class`."
             )
 
-        if not hasattr(cls, "event_types_dict"):
-            cls.event_types_dict = {c.event_type: c for c in cls.event_types}
+    @staticmethod
+    def event_data_json() -> Cast:
+        """
+        An expression for the stored data of an event as JSON text, for rows fetched as values to be validated with
+        `parse_event_data`.
+        """
+        return Cast("event_data", output_field=models.TextField())
+
+    @classmethod
+    def parse_event_data(cls, event_type: str, event_data: dict | str) -> AggregateEvent:
+        """
+        Validate the stored data of an event.
+
+        This allows replaying events from rows fetched as values, without instantiating the event models. The data may be
+        given as JSON text, selected with `event_data_json`, in which case it is validated straight from the JSON rather
+        than being decoded into Python objects first.
+        """
+        event_class = cls.get_event_class(event_type)
+        if isinstance(event_data, str):
+            return event_class.model_validate_json(event_data)
 
-        return cls.event_types_dict[event_type]
+        return event_class.model_validate(event_data)
 
     def get_event_data(self) -> AggregateEvent:
         if not hasattr(self, "_event_data"):
-            self._event_data = self.get_event_class(self.event_type).model_validate(self.event_data)
+            self._event_data = self.parse_event_data(self.event_type, self.event_data)
 
         return self._event_data
+
+
+class AggregateSnapshotManagerMixin:
+    def take(self, aggregates: list[AggregateModel]):
+        """
+        Snapshot the current state of the aggregates.
+
+        The position of each snapshot is the last event in the aggregate's event stream, so this must only be called once
+        the aggregates and their events have been persisted.
+        """
+        if not aggregates:
+            return
+
+        event_model = aggregates[0].get_event_model()
+        last_events = (
+            event_model.objects.filter(aggregate_id__in=[aggregate.get_aggregate_id() for aggregate in aggregates])
+            .order_by("aggregate_id", "-occurred_at", F("sequence_number").desc(nulls_last=True), "-id")
+            .distinct("aggregate_id")
+            .only("id", "aggregate_id", "occurred_at", "sequence_number")
+        )
+        last_events_by_id = {event.aggregate_id: event for event in last_events}
+
+        instances = []
+        for aggregate in aggregates:
+            last_event = last_events_by_id.get(aggregate.get_aggregate_id())
+            if last_event is None:
+                continue
+
+            instances.append(
+                self.model(
+                    aggregate_id=aggregate.get_aggregate_id(),
+                    version=aggregate.version,
+                    snapshot_version=aggregate.snapshot_version,
+                    state_data=aggregate.save_snapshot(),
+                    occurred_at=last_event.occurred_at,
+                    sequence_number=last_event.sequence_number,
+                    event_id=last_event.id,
+                )
+            )
+
+        self.bulk_create(instances)
+
+    def invalidate_from(self, occurred_at_by_id: dict[str, datetime]):
+        """
+        Remove any snapshots at or after the given time for each aggregate.
+
+        Editing or backdating events changes the state of the aggregate for every point after the change, so any snapshots
+        taken after that point are no longer valid.
+        """
+        if not occurred_at_by_id:
+            return
+
+        stale = Q()
+        for aggregate_id, occurred_at in occurred_at_by_id.items():
+            stale |= Q(aggregate_id=aggregate_id, occurred_at__gte=occurred_at)
+
+        self.filter(stale).delete()
+
+    def latest_for(
+        self, aggregate_ids: Iterable[str], snapshot_version: int, before: datetime | None = None
+    ) -> dict[str, "AggregateSnapshotModel"]:
+        """
+        Find the latest usable snapshot for each of the aggregates, optionally only considering those before a time.
+        """
+        snapshots = self.filter(aggregate_id__in=aggregate_ids, snapshot_version=snapshot_version)
+        if before is not None:
+            snapshots = snapshots.filter(occurred_at__lt=before)
+
+        snapshots = snapshots.order_by(
+            "aggregate_id", "-occurred_at", F("sequence_number").desc(nulls_last=True), "-event_id"
+        ).distinct("aggregate_id")
+
+        return {snapshot.aggregate_id: snapshot for snapshot in snapshots}
+
+
+class AggregateSnapshotModelManager(AggregateSnapshotManagerMixin, models.Manager):
+    pass
+
+
+class AggregateSnapshotModel(models.Model):
+    """
+    A copy of the state of an aggregate at a position in its event stream.
+
+    Snapshots allow the state of an aggregate to be rebuilt by loading the snapshot and replaying only the events after
+    it, instead of replaying the entire event stream. The position is stored as the `occurred_at`, `sequence_number`, and
+    `id` of the last event included in the snapshot, matching the default ordering of the event store.
+    """
+
+    aggregate_id = models.CharField(db_index=True)
+    version = models.PositiveIntegerField()
+    snapshot_version = models.PositiveIntegerField()
+    state_data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_created=True, db_default=Now())
+    occurred_at = models.DateTimeField()
+    sequence_number = models.CharField(null=True)
+    event_id = models.BigIntegerField()
+
+    objects = AggregateSnapshotModelManager()
+
+    class Meta:
+        abstract = True
+
+    def events_after(self) -> Q:
+        """A filter for the events in the aggregate's event stream that come after this snapshot."""
+        if self.sequence_number is None:
+            at_same_time = Q(sequence_number__isnull=False) | Q(sequence_number__isnull=True, id__gt=self.event_id)
+        else:
+            at_same_time = Q(sequence_number__gt=self.sequence_number) | Q(
+                sequence_number=self.sequence_number, id__gt=self.event_id
+            )
+
+        return Q(aggregate_id=self.aggregate_id) & (
+            Q(occurred_at__gt=self.occurred_at) | (Q(occurred_at=self.occurred_at) & at_same_time)
+        )
@@ -1,60 +1,54 @@
 from __future__ import annotations
 
-import abc
 import importlib
 import logging
+from itertools import groupby
+from typing import Any
 
 from eventsourcing.notifications import Notification
 
 logger = logging.getLogger(__name__)
 
 
-def get_notification_bus() -> "NotificationBus":
-    return LocalNotificationBus()
-
-
-class _Singleton:
-    _instances = {}
-
-    def __new__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super().__new__(cls)
-        return cls._instances[cls]
-
-
-class NotificationBus(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
+class NotificationBus:
     def boot(self):
         raise NotImplementedError()
 
-    @abc.abstractmethod
     def dispatch(self, event: Notification):
         raise NotImplementedError()
 
-    @abc.abstractmethod
     def dispatch_all(self, events: list[Notification]):
         raise NotImplementedError()
 
 
-class LocalNotificationBus(_Singleton, NotificationBus):
+class LocalNotificationBus(NotificationBus):
     def __init__(self):
         self._booted = False
-        self._event_subscriber_classes = {}
+        self._event_subscribers: dict[str, list[tuple[Any, bool]]] = {}
+        self._subscribers_by_class: dict[type, list[tuple[Any, bool]]] = {}
 
     def _boot_subscribers(self):
         from django.conf import settings
 
         subscribe_map = settings.BUSES_NOTIFICATION_SUBSCRIBERS
 
-        for event_fqdn, subscriber_fqdns in subscribe_map.items():
-            self._event_subscriber_classes[event_fqdn] = []
+        # Each subscriber is imported and created once, even when it subscribes to many notifications. Subscribers are
+        # reused for every notification, unless they hold state for a single notification, in which case a new instance is
+        # created each time.
+        subscribers = {}
+        for subscriber_fqdn in {fqdn for subscriber_fqdns in subscribe_map.values() for fqdn in subscriber_fqdns}:
+            subscriber_class = _import_from_fqdn(subscriber_fqdn)
+            stateful = getattr(subscriber_class, "stateful", False)
+            subscribers[subscriber_fqdn] = (subscriber_class if stateful else subscriber_class(), stateful)
 
-            for subscriber in subscriber_fqdns:
-                module_name, class_name = subscriber.rsplit(".", 1)
-                module = importlib.import_module(module_name)
-                subscriber_class = getattr(module, class_name)
+        for event_fqdn, subscriber_fqdns in subscribe_map.items():
+            self._event_subscribers[event_fqdn] = [subscribers[fqdn] for fqdn in subscriber_fqdns]
 
-                self._event_subscriber_classes[event_fqdn].append(subscriber_class)
+            # Resolve the notification classes up front so that dispatching is a lookup by the class of the notification,
+            # rather than building its FQDN for every notification. Notifications without subscribers are left out, so
+            # that dispatching them stops at the lookup.
+            if subscriber_fqdns:
+                self._subscribers_by_class[_import_from_fqdn(event_fqdn)] = self._event_subscribers[event_fqdn]
 
     def boot(self):
         if self._booted:
@@ -68,17 +62,71 @@ class LocalNotificationBus(_Singleton, NotificationBus):
         if not self._booted:
             self.boot()
 
-        event_fqdn = ".".join([event.__class__.__module__, event.__class__.__qualname__])
-
-        results = []
-
-        for subscriber_class in self._event_subscriber_classes.get(event_fqdn, []):
-            results.append(self._do_dispatch(subscriber_class, event))
+        # Subscribers are called in the order they are configured in, since a subscriber may rely on the work of the
+        # subscribers before it.
+        for subscriber, stateful in self._subscribers_by_class.get(type(event), ()):
+            (subscriber() if stateful else subscriber).handle(event)
 
     def dispatch_all(self, events: list[Notification]):
-        for event in events:
-            self.dispatch(event)
+        if not self._booted:
+            self.boot()
+
+        if not self._subscribers_by_class:
+            return
 
-    def _do_dispatch(self, subscriber_class, event):
-        instance = subscriber_class()
-        instance.handle(event)
+        # Consecutive notifications of the same type are handed to each subscriber as a single batch. Only consecutive
+        # notifications are batched so that subscribers still receive the notifications in the order they were dispatched.
+        get_subscribers = self._subscribers_by_class.get
+        do_dispatch_batch = self._do_dispatch_batch
+        for event_class, batch in groupby(events, key=type):
+            subscribers = get_subscribers(event_class)
+            if not subscribers:
+                continue
+
+            batch = list(batch)
+            for subscriber, stateful in subscribers:
+                do_dispatch_batch(subscriber, stateful, batch)
+
+    def _do_dispatch_batch(self, subscriber, stateful: bool, events: list[Notification]):
+        if stateful:
+            for event in events:
+                subscriber().handle(event)
+        elif hasattr(subscriber, "handle_batch"):
+            subscriber.handle_batch(events)
+        else:
+            for event in events:
+                subscriber.handle(event)
+
+
+def _import_from_fqdn(fqdn: str) -> Any:
+    """
+    Import a class from its module and qualified name, so that classes nested in other classes can be configured as well.
+    """
+    parts = fqdn.split(".")
+    for index in range(len(parts) - 1, 0, -1):
+        module_name = ".".join(parts[:index])
+        try:
+            obj = importlib.import_module(module_name)
+        except ModuleNotFoundError as e:
+            # Only move on to a shorter module name when this name is not a module, rather than when one of its imports fails.
+            if e.name is None or not f"{module_name}.".startswith(f"{e.name}."):
+                raise
+            continue
+
+        try:
+            for name in parts[index:]:
+                obj = getattr(obj, name)
+        except AttributeError as e:
+            raise ImportError(f"Module {module_name} does not define {'.'.join(parts[index:])}.") from e
+
+        return obj
+
+    raise ImportError(f"{fqdn} is not a module and qualified name.")
+
+
+_notification_bus = LocalNotificationBus()
+"""The notification bus for the process, booted when the eventsourcing app is ready."""
+
+
+def get_notification_bus() -> NotificationBus:
+    return _notification_bus
@@ -1,7 +1,4 @@
-import abc
-
-
-class Notification(metaclass=abc.ABCMeta):
+class Notification:
     def dispatch(self):
         from eventsourcing.notification_bus import get_notification_bus
 
@@ -10,7 +7,21 @@ class Notification(metaclass=abc.ABCMeta):
         return bus.dispatch(self)
 
 
-class Subscriber(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
+class Subscriber:
+    stateful = False
+    """
+    Set to `True` for subscribers that hold state while handling a notification, so that the notification bus creates a new
+    instance for every notification rather than reusing a single instance.
+    """
+
     def handle(self, event: Notification):
         raise NotImplementedError()
+
+    def handle_batch(self, events: list[Notification]):
+        """
+        Handle a batch of notifications of the same type, in the order they were dispatched.
+
+        Subscribers can override this to handle the batch together, such as writing a read model with a single bulk query.
+        """
+        for event in events:
+            self.handle(event)
@@ -1,20 +1,42 @@
-import re
+from typing import Callable
 
 from eventsourcing.domain_events import AggregateEvent
+from eventsourcing.domain_events import camel_to_snake
 from eventsourcing.notification_bus import Notification
 
 
 class Projector:
-    _fn_name_pattern = re.compile(r"(?<!^)(?=[A-Z])")
+    _apply_handlers: dict[type, Callable] = {}
+    """The apply function for each event class, resolved once for each projector class."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        cls._apply_handlers = {}
 
     def handle(self, event: Notification):
         self.apply(event)
 
+    def handle_batch(self, events: list[Notification]):
+        for event in events:
+            self.apply(event)
+
     def apply(self, event: AggregateEvent):
-        name = self._fn_name_pattern.sub("_", event.__class__.__name__).lower()
+        try:
+            fn = self._apply_handlers[type(event)]
+        except KeyError:
+            fn = self._resolve_apply_handler(type(event))
+
+        fn(self, event)
+
+    @classmethod
+    def _resolve_apply_handler(cls, event_class: type) -> Callable:
+        name = getattr(event_class, "handler_name", None) or camel_to_snake(event_class.__name__)
         fn_name = f"apply_{name}"
 
-        if not hasattr(self, fn_name):
+        if not hasattr(cls, fn_name):
             raise NotImplementedError(f"Method {fn_name} not implemented")
 
-        getattr(self, fn_name)(event)
+        fn = getattr(cls, fn_name)
+        cls._apply_handlers[event_class] = fn
+        return fn
@@ -130,3 +130,5 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 BUSES_NOTIFICATION_SUBSCRIBERS = {}
+
+EVENTSOURCING_BULK_BATCH_SIZE = int(os.environ.get("EVENTSOURCING_BULK_BATCH_SIZE", "500"))
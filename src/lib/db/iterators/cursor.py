@@ -2,15 +2,27 @@ from typing import Any
 from typing import Generator
 from typing import TypeVar
 
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models import Field
 from django.db.models import Model
 from django.db.models import Q
 from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
 
 T = TypeVar("T", bound=Model)
 QS = TypeVar("QS", bound=QuerySet[T])
 
 
-def cursor(qset: QS, primary_key: str, tiebreaker_key: str | None = None, size: int = 1000) -> Generator[T, Any, Any]:
+def cursor(
+    qset: QS,
+    primary_key: str,
+    tiebreaker_key: str | None = None,
+    size: int = 1000,
+    values: list[str] | None = None,
+    only: list[str] | None = None,
+) -> Generator[T | dict[str, Any], Any, Any]:
     """
     Iterate over a queryset using cursor pagination.
 
@@ -29,6 +41,10 @@ def cursor(qset: QS, primary_key: str, tiebreaker_key: str | None = None, size:
         primary_key: The primary key to use for ordering. For descending order, prepend the key with a "-".
         tiebreaker_key: The tiebreaker key to use for ordering. For descending order, prepend the key with a "-".
         size: The number of results to return per iteration. This should be optimized based on the expected number of results.
+        values: (Optional) The fields to return as dictionaries instead of model instances. The primary key and tiebreaker
+            are always included.
+        only: (Optional) The fields to load onto the model instances, deferring the rest. The primary key and tiebreaker
+            are always included.
 
     Returns:
 
@@ -43,16 +59,31 @@ def cursor(qset: QS, primary_key: str, tiebreaker_key: str | None = None, size:
         tiebreaker_lookup = None
         qset = qset.order_by(primary_key)
 
+    key_lookups = [primary_lookup, tiebreaker_lookup] if tiebreaker_lookup else [primary_lookup]
+    if values is not None:
+        qset = qset.values(*values, *[lookup for lookup in key_lookups if lookup not in values])
+        get_key = dict.__getitem__
+    else:
+        if only is not None:
+            qset = qset.only(*only, *key_lookups)
+        get_key = getattr
+
+    # Fetch one more than the page size to find whether there is another page. The extra row is yielded as well, rather
+    # than fetched again with the next page, and the next page starts after it.
     results = list(qset[: size + 1])
 
-    yield from results[:size]
+    yield from results
 
     while len(results) > size:
-        last_used = results[-2]
-        last_used_primary = getattr(last_used, primary_lookup)
+        last_used = results[-1]
+        last_used_primary = get_key(last_used, primary_lookup)
 
-        if tiebreaker_key:
-            last_used_tiebreaker = getattr(last_used, tiebreaker_lookup)
+        if tiebreaker_key and primary_comparison == tiebreaker_comparison and _supports_row_comparison(qset, key_lookups):
+            # Compare the primary key and tiebreaker as a row, which Postgres plans as a single range scan on an index of
+            # both columns.
+            next_qset = qset.filter(_row_comparison(qset, key_lookups, last_used, primary_comparison))
+        elif tiebreaker_key:
+            last_used_tiebreaker = get_key(last_used, tiebreaker_lookup)
             next_qset = qset.filter(
                 # The primary key is greater than the last used primary key
                 Q(**{f"{primary_lookup}__{primary_comparison}": last_used_primary})
@@ -68,4 +99,42 @@ def cursor(qset: QS, primary_key: str, tiebreaker_key: str | None = None, size:
             next_qset = qset.filter(**{f"{primary_lookup}__{primary_comparison}": last_used_primary})
 
         results = list(next_qset[: size + 1])
-        yield from results[:size]
+        yield from results
+
+
+def _get_field(qset: QuerySet, lookup: str) -> Field:
+    opts = qset.model._meta
+    return opts.pk if lookup == "pk" else opts.get_field(lookup)
+
+
+def _supports_row_comparison(qset: QuerySet, lookups: list[str]) -> bool:
+    if connections[qset.db].vendor != "postgresql":
+        return False
+
+    # Only concrete columns of the model's own table can be compared as a row, not those of a parent model's table.
+    try:
+        fields = [_get_field(qset, lookup) for lookup in lookups]
+    except FieldDoesNotExist:
+        return False
+
+    return all(field.concrete and field.model is qset.model._meta.concrete_model for field in fields)
+
+
+def _row_comparison(qset: QuerySet, lookups: list[str], last_used: Model | dict[str, Any], comparison: str) -> RawSQL:
+    connection = connections[qset.db]
+    fields = [_get_field(qset, lookup) for lookup in lookups]
+
+    # Rows fetched as values hold the column value under the lookup, while model instances hold the related object under the
+    # name of a foreign key, so the column values of instances are read by their attribute names instead.
+    if isinstance(last_used, dict):
+        values = [last_used[lookup] for lookup in lookups]
+    else:
+        values = [getattr(last_used, field.attname) for field in fields]
+    table = connection.ops.quote_name(qset.model._meta.db_table)
+
+    columns = ", ".join(f"{table}.{connection.ops.quote_name(field.column)}" for field in fields)
+    placeholders = ", ".join("%s" for _ in fields)
+    operator = ">" if comparison == "gt" else "<"
+    params = [field.get_db_prep_value(value, connection) for field, value in zip(fields, values)]
+
+    return RawSQL(f"({columns}) {operator} ({placeholders})", params, output_field=BooleanField())
@@ -5,6 +5,7 @@ from typing import Annotated
 from typing import Literal
 
 from pydantic import BaseModel
+from pydantic import ConfigDict
 from pydantic import Discriminator
 
 from eventsourcing.domain_events import AggregateEvent
@@ -22,19 +23,27 @@ class ActionEventType(StrEnum):
     ACTION_DELETED = "ACTION_DELETED"
 
 
-class ReceiveVolumeRecordedData(BaseModel):
+class ActionEventDetails(BaseModel):
+    """
+    Base class for the details carried by action events, which are frozen like the events that carry them.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+
+class ReceiveVolumeRecordedData(ActionEventDetails):
     action_type: Literal[ActionType.RECEIVE_VOLUME] = ActionType.RECEIVE_VOLUME
     wine_lot_id: str
     volume: Decimal
 
 
-class MeasureVolumeRecordedData(BaseModel):
+class MeasureVolumeRecordedData(ActionEventDetails):
     action_type: Literal[ActionType.REMEASURE] = ActionType.REMEASURE
     wine_lot_id: str
     volume: Decimal
 
 
-class BlendRecordedData(BaseModel):
+class BlendRecordedData(ActionEventDetails):
     action_type: Literal[ActionType.BLEND] = ActionType.BLEND
     blend_volumes: dict[str, Decimal]
     """Mapping of wine lot IDs to their blend amounts."""
@@ -48,56 +57,62 @@ class BlendRecordedData(BaseModel):
     """
 
 
-class BottleRecordedData(BaseModel):
+class BottleRecordedData(ActionEventDetails):
     action_type: Literal[ActionType.BOTTLE] = ActionType.BOTTLE
     wine_lot_id: str
     volume_bottled: Decimal
     bottles: int
 
 
+RecordedDetails = Annotated[
+    ReceiveVolumeRecordedData | MeasureVolumeRecordedData | BlendRecordedData | BottleRecordedData,
+    Discriminator("action_type"),
+]
+
+
 class ActionRecorded(ActionEvent):
     event_type = ActionEventType.ACTION_RECORDED
     effective_at: datetime
     recorded_at: datetime
-    details: Annotated[
-        ReceiveVolumeRecordedData | MeasureVolumeRecordedData | BlendRecordedData | BottleRecordedData,
-        Discriminator("action_type"),
-    ]
+    details: RecordedDetails
 
 
-class ReceiveVolumeEditedData(BaseModel):
+class ReceiveVolumeEditedData(ActionEventDetails):
     action_type: Literal[ActionType.RECEIVE_VOLUME] = ActionType.RECEIVE_VOLUME
     wine_lot_id: ValueChange[str]
     volume: ValueChange[Decimal]
 
 
-class MeasureVolumeEditedData(BaseModel):
+class MeasureVolumeEditedData(ActionEventDetails):
     action_type: Literal[ActionType.REMEASURE] = ActionType.REMEASURE
     wine_lot_id: ValueChange[str]
     volume: ValueChange[Decimal]
 
 
-class BlendEditedData(BaseModel):
+class BlendEditedData(ActionEventDetails):
     action_type: Literal[ActionType.BLEND] = ActionType.BLEND
     blend_volumes: ValueChange[dict[str, Decimal]]  # Mapping of wine lot IDs to their blend proportions
     receiving_wine_lot_id: ValueChange[str]  # ID of the wine lot receiving the blend
     blended_volume: ValueChange[Decimal]
 
 
-class BottleEditedData(BaseModel):
+class BottleEditedData(ActionEventDetails):
     action_type: Literal[ActionType.BOTTLE] = ActionType.BOTTLE
     wine_lot_id: ValueChange[str]
     volume_bottled: ValueChange[Decimal]
     bottles: ValueChange[int]
 
 
+EditedDetails = Annotated[
+    ReceiveVolumeEditedData | MeasureVolumeEditedData | BlendEditedData | BottleEditedData,
+    Discriminator("action_type"),
+]
+
+
 class ActionEdited(ActionEvent):
     event_type = ActionEventType.ACTION_EDITED
     edited_at: datetime
-    details: Annotated[
-        ReceiveVolumeEditedData | MeasureVolumeEditedData | BlendEditedData | BottleEditedData,
-        Discriminator("action_type"),
-    ]
+    details: EditedDetails
 
 
 class ActionDeleted(ActionEvent):
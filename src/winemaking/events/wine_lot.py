@@ -1,5 +1,6 @@
 from decimal import Decimal
 from enum import StrEnum
+from functools import cached_property
 
 from eventsourcing.domain_events import ActionSequenced
 from eventsourcing.domain_events import AggregateEvent
@@ -7,7 +8,6 @@ from eventsourcing.domain_events import Timestamped
 from eventsourcing.domain_events import ValueChange
 from winemaking.types import ComponentAmount
 from winemaking.types import Composition
-from winemaking.types import LotComponent
 
 
 class WineLotEventType(StrEnum):
@@ -26,17 +26,14 @@ class WineLotCreated(AggregateEvent, Timestamped):
     code: str
     components: list[ComponentAmount]
 
-    @property
+    @cached_property
     def composition(self) -> Composition:
-        """Convenience property to access the composition of the wine lot."""
-        return Composition(
-            components={
-                LotComponent(
-                    variety=c.component.variety, appellation=c.component.appellation, vintage=c.component.vintage
-                ): c.percent
-                for c in self.components
-            }
-        )
+        """
+        Convenience property to access the composition of the wine lot, computed once per event.
+
+        Lot components are frozen, so the components of the event are shared with the composition rather than copied.
+        """
+        return Composition(components={c.component: c.percent for c in self.components})
 
 
 class WineLotUpdated(AggregateEvent):
@@ -46,6 +43,13 @@ class WineLotUpdated(AggregateEvent):
 
 class WineLotDeleted(Timestamped, AggregateEvent):
     event_type = WineLotEventType.DELETED
+    tombstone_suffix: str | None = None
+    """
+    The unique suffix added to the code of the deleted lot, so that the code can be reused.
+
+    It is generated when the lot is deleted so that replaying the event always gives the same code. Events stored before it
+    was added don't have one.
+    """
 
 
 class VolumeBlended(ActionSequenced, Timestamped, AggregateEvent):
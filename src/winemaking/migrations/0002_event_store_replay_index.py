@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-15 22:23
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("winemaking", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="actioneventstore",
+            name="aggregate_id",
+            field=models.CharField(),
+        ),
+        migrations.AlterField(
+            model_name="wineloteventstore",
+            name="aggregate_id",
+            field=models.CharField(),
+        ),
+        migrations.AddIndex(
+            model_name="actioneventstore",
+            index=models.Index(
+                models.F("aggregate_id"),
+                models.F("occurred_at"),
+                models.OrderBy(models.F("sequence_number"), nulls_first=True),
+                models.F("id"),
+                name="actioneventstore_replay_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wineloteventstore",
+            index=models.Index(
+                models.F("aggregate_id"),
+                models.F("occurred_at"),
+                models.OrderBy(models.F("sequence_number"), nulls_first=True),
+                models.F("id"),
+                name="wineloteventstore_replay_idx",
+            ),
+        ),
+    ]
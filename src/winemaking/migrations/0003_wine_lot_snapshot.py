@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-15 22:42
+
+import django.core.serializers.json
+import django.db.models.functions.datetime
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("winemaking", "0002_event_store_replay_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WineLotSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_created=True, db_default=django.db.models.functions.datetime.Now())),
+                ("aggregate_id", models.CharField(db_index=True)),
+                ("version", models.PositiveIntegerField()),
+                ("snapshot_version", models.PositiveIntegerField()),
+                ("state_data", models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ("occurred_at", models.DateTimeField()),
+                ("sequence_number", models.CharField(null=True)),
+                ("event_id", models.BigIntegerField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from datetime import datetime
 from decimal import Decimal
 from typing import Annotated
+from typing import Any
+from typing import Callable
 from typing import Literal
 from typing import Self
 from typing import TypeVar
@@ -58,35 +60,57 @@ class BottleData(BaseModel):
     bottles: int
 
 
-#
-# ActionDetails = Annotated[
-#     Union[
-#         ReceiveVolumeData,
-#         MeasureVolumeData,
-#         BlendData,
-#         BottleData
-#     ],
-#     Discriminator("action_type")
-# ]
-#
-#
-# ActionDetailsAdapter = TypeAdapter(ActionDetails)
-#
+ActionDetailsData = Annotated[
+    ReceiveVolumeData | MeasureVolumeData | BlendData | BottleData,
+    Discriminator("action_type"),
+]
 
 
 class ActionEventStore(AggregateEventModel):
-    event_types = [
+    event_types = (
         ActionRecorded,
         ActionEdited,
         ActionDeleted,
-    ]
+    )
 
 
 class ActionDetails(BaseModel):
-    data: Annotated[
-        ReceiveVolumeData | MeasureVolumeData | BlendData | BottleData,
-        Discriminator("action_type"),
-    ]
+    data: ActionDetailsData
+
+
+_RECORDED_DATA_CLASSES: dict[type[BaseModel], type[BaseModel]] = {
+    ReceiveVolumeRecordedData: ReceiveVolumeData,
+    MeasureVolumeRecordedData: MeasureVolumeData,
+    BlendRecordedData: BlendData,
+    BottleRecordedData: BottleData,
+}
+"""The action details data class for the details of each type of recorded action."""
+
+_EDITED_DATA_CLASSES: dict[type[BaseModel], type[BaseModel]] = {
+    ReceiveVolumeEditedData: ReceiveVolumeData,
+    MeasureVolumeEditedData: MeasureVolumeData,
+    BlendEditedData: BlendData,
+    BottleEditedData: BottleData,
+}
+"""
+The action details data class for the details of each type of edited action. The fields of the edited details are the
+changes to each of the fields of the data class.
+"""
+
+_INVOLVED_WINE_LOT_IDS: dict[type[BaseModel], Callable[[Any], list[str]]] = {
+    ReceiveVolumeData: lambda data: [data.wine_lot_id],
+    MeasureVolumeData: lambda data: [data.wine_lot_id],
+    BlendData: lambda data: [data.receiving_wine_lot_id, *data.blend_volumes],
+    BottleData: lambda data: [data.wine_lot_id],
+}
+
+_EDITED_AS: dict[ActionType, str] = {
+    ActionType.RECEIVE_VOLUME: "a volume receipt",
+    ActionType.REMEASURE: "a volume remeasurement",
+    ActionType.BLEND: "a blend",
+    ActionType.BOTTLE: "a bottling",
+}
+"""How each type of action is described when an action cannot be edited as that type."""
 
 
 class Action(AggregateModel):
@@ -100,15 +124,17 @@ class Action(AggregateModel):
 
     details = SchemaField(ActionDetails)
 
+    @classmethod
     def get_event_model(cls):
         return ActionEventStore
 
     @classmethod
     def record_receive_volume(cls, wine_lot: WineLot, volume: Decimal, effective_at: datetime = None) -> Self:
+        now = timezone.now()
         event = ActionRecorded(
             aggregate_id=cls.next_id(),
-            effective_at=effective_at or timezone.now(),
-            recorded_at=timezone.now(),
+            effective_at=effective_at or now,
+            recorded_at=now,
             details=ReceiveVolumeRecordedData(
                 wine_lot_id=wine_lot.id,
                 volume=volume,
@@ -120,10 +146,11 @@ class Action(AggregateModel):
 
     @classmethod
     def record_remeasure(cls, wine_lot: WineLot, volume: Decimal, effective_at: datetime = None) -> Self:
+        now = timezone.now()
         event = ActionRecorded(
             aggregate_id=cls.next_id(),
-            effective_at=effective_at or timezone.now(),
-            recorded_at=timezone.now(),
+            effective_at=effective_at or now,
+            recorded_at=now,
             details=MeasureVolumeRecordedData(wine_lot_id=wine_lot.id, volume=volume),
         )
         action = cls()
@@ -133,7 +160,7 @@ class Action(AggregateModel):
     @classmethod
     def record_blend(
         cls,
-        blend_volumes: dict[WineLot, Decimal],
+        blend_volumes: dict[WineLot, Decimal] | dict[str, Decimal],
         receiving_wine_lot: WineLot,
         blended_volume: Decimal,
         effective_at: datetime = None,
@@ -144,12 +171,13 @@ class Action(AggregateModel):
         if total_moved_volume == 0:
             raise ValueError("Total blended volume cannot be zero.")
 
+        now = timezone.now()
         event = ActionRecorded(
             aggregate_id=cls.next_id(),
-            effective_at=effective_at or timezone.now(),
-            recorded_at=timezone.now(),
+            effective_at=effective_at or now,
+            recorded_at=now,
             details=BlendRecordedData(
-                blend_volumes={wine_lot.id: volume for wine_lot, volume in blend_volumes.items()},
+                blend_volumes=_blend_volumes_by_id(blend_volumes),
                 receiving_wine_lot_id=receiving_wine_lot.id,
                 blended_volume=blended_volume,
             ),
@@ -160,10 +188,11 @@ class Action(AggregateModel):
 
     @classmethod
     def record_bottle(cls, wine_lot: WineLot, volume_bottled: Decimal, bottles: int, effective_at: datetime = None) -> Self:
+        now = timezone.now()
         event = ActionRecorded(
             aggregate_id=cls.next_id(),
-            effective_at=effective_at or timezone.now(),
-            recorded_at=timezone.now(),
+            effective_at=effective_at or now,
+            recorded_at=now,
             details=BottleRecordedData(wine_lot_id=wine_lot.id, volume_bottled=volume_bottled, bottles=bottles),
         )
         action = cls()
@@ -177,12 +206,18 @@ class Action(AggregateModel):
         event = ActionDeleted(aggregate_id=self.id, deleted_at=timezone.now())
         self.apply(event)
 
-    def edit_receive_volume(self, wine_lot: WineLot, volume: Decimal):
-        if self.action_type != ActionType.RECEIVE_VOLUME:
-            raise ValueError(f"Cannot edit a {self.action_type} action as a volume receipt.")
+    def check_editable(self, action_type: ActionType):
+        """
+        Check that the action can be edited as the given type of action, raising a ValueError if it cannot.
+        """
+        if self.action_type != action_type:
+            raise ValueError(f"Cannot edit a {self.action_type} action as {_EDITED_AS[action_type]}.")
         if self.deleted_at is not None:
             raise ValueError("Cannot edit a deleted action.")
 
+    def edit_receive_volume(self, wine_lot: WineLot, volume: Decimal):
+        self.check_editable(ActionType.RECEIVE_VOLUME)
+
         current_details = cast(ReceiveVolumeData, self.details.data)
         event = ActionEdited(
             aggregate_id=self.id,
@@ -196,10 +231,7 @@ class Action(AggregateModel):
         self.apply(event)
 
     def edit_remeasure(self, wine_lot: WineLot, volume: Decimal):
-        if self.action_type != ActionType.REMEASURE:
-            raise ValueError(f"Cannot edit a {self.action_type} action as a volume remeasurement.")
-        if self.deleted_at is not None:
-            raise ValueError("Cannot edit a deleted action.")
+        self.check_editable(ActionType.REMEASURE)
 
         current_details = cast(MeasureVolumeData, self.details.data)
         event = ActionEdited(
@@ -213,11 +245,13 @@ class Action(AggregateModel):
         )
         self.apply(event)
 
-    def edit_blend(self, blend_volumes: dict[WineLot, Decimal], receiving_wine_lot: WineLot, blended_volume: Decimal):
-        if self.action_type != ActionType.BLEND:
-            raise ValueError(f"Cannot edit a {self.action_type} action as a blend.")
-        if self.deleted_at is not None:
-            raise ValueError("Cannot edit a deleted action.")
+    def edit_blend(
+        self,
+        blend_volumes: dict[WineLot, Decimal] | dict[str, Decimal],
+        receiving_wine_lot: WineLot,
+        blended_volume: Decimal,
+    ):
+        self.check_editable(ActionType.BLEND)
 
         if blended_volume <= 0:
             raise ValueError("Blended volume must be greater than zero.")
@@ -233,7 +267,7 @@ class Action(AggregateModel):
                 action_type=ActionType.BLEND,
                 blend_volumes=ValueChange(
                     before=current_details.blend_volumes,
-                    after={wine_lot.id: volume for wine_lot, volume in blend_volumes.items()},
+                    after=_blend_volumes_by_id(blend_volumes),
                 ),
                 receiving_wine_lot_id=ValueChange(before=current_details.receiving_wine_lot_id, after=receiving_wine_lot.id),
                 blended_volume=ValueChange(before=current_details.blended_volume, after=blended_volume),
@@ -242,10 +276,7 @@ class Action(AggregateModel):
         self.apply(event)
 
     def edit_bottle(self, wine_lot: WineLot, volume_bottled: Decimal, bottles: int):
-        if self.action_type != ActionType.BOTTLE:
-            raise ValueError(f"Cannot edit a {self.action_type} action as a bottling.")
-        if self.deleted_at is not None:
-            raise ValueError("Cannot edit a deleted action.")
+        self.check_editable(ActionType.BOTTLE)
 
         current_details: BottleData = cast(BottleData, self.details.data)
         event = ActionEdited(
@@ -267,89 +298,37 @@ class Action(AggregateModel):
         self.deleted_at = None
         self.revision_number = 0
 
-        if isinstance(event.details, ReceiveVolumeRecordedData):
-            self.action_type = ActionType.RECEIVE_VOLUME
-            self.details = ActionDetails(
-                data=ReceiveVolumeData(
-                    action_type=ActionType.RECEIVE_VOLUME,
-                    wine_lot_id=event.details.wine_lot_id,
-                    volume=event.details.volume,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id]
-        elif isinstance(event.details, MeasureVolumeRecordedData):
-            self.action_type = ActionType.REMEASURE
-            self.details = ActionDetails(
-                data=MeasureVolumeData(
-                    action_type=ActionType.REMEASURE, wine_lot_id=event.details.wine_lot_id, volume=event.details.volume
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id]
-        elif isinstance(event.details, BlendRecordedData):
-            self.action_type = ActionType.BLEND
-            self.details = ActionDetails(
-                data=BlendData(
-                    action_type=ActionType.BLEND,
-                    blend_volumes=event.details.blend_volumes,
-                    receiving_wine_lot_id=event.details.receiving_wine_lot_id,
-                    blended_volume=event.details.blended_volume,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.receiving_wine_lot_id, *event.details.blend_volumes.keys()]
-        elif isinstance(event.details, BottleRecordedData):
-            self.action_type = ActionType.BOTTLE
-            self.details = ActionDetails(
-                data=BottleData(
-                    action_type=ActionType.BOTTLE,
-                    wine_lot_id=event.details.wine_lot_id,
-                    volume_bottled=event.details.volume_bottled,
-                    bottles=event.details.bottles,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id]
+        data_class = _RECORDED_DATA_CLASSES[type(event.details)]
+        self._set_details(data_class.model_construct(**event.details.__dict__))
 
     def apply_action_edited(self, event: ActionEdited):
         self.revision_number += 1
         self.updated_at = event.edited_at
 
-        if isinstance(event.details, ReceiveVolumeEditedData):
-            self.details = ActionDetails(
-                data=ReceiveVolumeData(
-                    action_type=ActionType.RECEIVE_VOLUME,
-                    wine_lot_id=event.details.wine_lot_id.after,
-                    volume=event.details.volume.after,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id.after]
-        elif isinstance(event.details, MeasureVolumeEditedData):
-            self.details = ActionDetails(
-                data=MeasureVolumeData(
-                    action_type=ActionType.REMEASURE,
-                    wine_lot_id=event.details.wine_lot_id.after,
-                    volume=event.details.volume.after,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id.after]
-        elif isinstance(event.details, BlendEditedData):
-            self.details = ActionDetails(
-                data=BlendData(
-                    action_type=ActionType.BLEND,
-                    blend_volumes=event.details.blend_volumes.after,
-                    receiving_wine_lot_id=event.details.receiving_wine_lot_id.after,
-                    blended_volume=event.details.blended_volume.after,
-                )
+        data_class = _EDITED_DATA_CLASSES[type(event.details)]
+        self._set_details(
+            data_class.model_construct(
+                action_type=event.details.action_type,
+                **{name: change.after for name, change in event.details if name != "action_type"},
             )
-            self.involved_wine_lot_ids = [event.details.receiving_wine_lot_id.after, *event.details.blend_volumes.after.keys()]
-        elif isinstance(event.details, BottleEditedData):
-            self.details = ActionDetails(
-                data=BottleData(
-                    action_type=ActionType.BOTTLE,
-                    wine_lot_id=event.details.wine_lot_id.after,
-                    volume_bottled=event.details.volume_bottled.after,
-                    bottles=event.details.bottles.after,
-                )
-            )
-            self.involved_wine_lot_ids = [event.details.wine_lot_id.after]
+        )
+
+    def _set_details(self, data: ActionDetailsData):
+        # The details come from an event that has already been validated, and the fields of the event details match the
+        # fields of the data classes, so validating them again is skipped.
+        self.action_type = data.action_type
+        self.details = ActionDetails.model_construct(data=data)
+        self.involved_wine_lot_ids = _INVOLVED_WINE_LOT_IDS[type(data)](data)
 
     def apply_action_deleted(self, event: ActionDeleted):
         self.deleted_at = event.deleted_at
+
+
+def _blend_volumes_by_id(blend_volumes: dict[WineLot, Decimal] | dict[str, Decimal]) -> dict[str, Decimal]:
+    """
+    Key the blend volumes by wine lot ID, only building a new dictionary when they are keyed by wine lots.
+    """
+    if not blend_volumes or isinstance(next(iter(blend_volumes)), str):
+        return blend_volumes
+
+    return {wine_lot.id: volume for wine_lot, volume in blend_volumes.items()}
@@ -1,7 +1,9 @@
-import re
+import secrets
 import uuid
+from datetime import UTC
 from datetime import datetime
 from decimal import Decimal
+from functools import wraps
 from typing import Self
 
 from django.db import models
@@ -11,6 +13,7 @@ from django_pydantic_field.v2 import SchemaField
 from eventsourcing.domain_events import ValueChange
 from eventsourcing.models import AggregateEventModel
 from eventsourcing.models import AggregateModel
+from eventsourcing.models import AggregateSnapshotModel
 from winemaking.events.wine_lot import VolumeBlended
 from winemaking.events.wine_lot import VolumeBottled
 from winemaking.events.wine_lot import VolumeMoved
@@ -22,17 +25,48 @@ from winemaking.events.wine_lot import WineLotUpdated
 from winemaking.types import ComponentAmount
 from winemaking.types import Composition
 
-_CODE_REGEX = r"^[A-Z0-9]{1}[A-Z0-9_-]{0,48}[A-Z0-9]{1}$"
+_CODE_END_CHARACTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
 """
-A regular expression to validate wine lot codes.
+The characters wine lot codes may start and end with.
 
-They are made up of at least 2 uppercase alphanumeric characters, with optional hyphens
+Codes are made up of at least 2 uppercase alphanumeric characters, with optional hyphens
 or underscores in between.
 """
 
+_CODE_CHARACTERS = _CODE_END_CHARACTERS | {"-", "_"}
+"""The characters allowed anywhere in a wine lot code."""
+
+_ZERO_VOLUME = Decimal("0.00")
+"""The volume of a wine lot before any wine is received. Decimals are immutable, so every new lot shares this one."""
+
+_CREATED_AT = datetime(1970, 1, 1, tzinfo=UTC)
+"""
+When wine lots are created in their event streams, which forces the creation event to the front of any stream.
+
+It is a fixed UTC instant rather than midnight in the current time zone, so it doesn't depend on the active time zone.
+"""
+
+
+def _not_deleted(message: str):
+    """
+    Prevent a wine lot method from being called once the lot is deleted, raising a ValueError with the message instead.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.deleted_at is not None:
+                raise ValueError(message)
+
+            return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
 
 class WineLotEventStore(AggregateEventModel):
-    event_types = [
+    event_types = (
         WineLotCreated,
         WineLotUpdated,
         WineLotDeleted,
@@ -41,17 +75,28 @@ class WineLotEventStore(AggregateEventModel):
         VolumeRemeasured,
         VolumeMoved,
         VolumeBottled,
-    ]
+    )
+
+
+class WineLotSnapshot(AggregateSnapshotModel):
+    pass
 
 
 class WineLot(AggregateModel):
     code = models.CharField(max_length=100, unique=True)
-    volume = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    volume = models.DecimalField(max_digits=10, decimal_places=2, default=_ZERO_VOLUME)
     deleted_at = models.DateTimeField(null=True)
 
+    snapshot_model = WineLotSnapshot
+    snapshot_every_versions = 50
+    """
+    Wine lots are persisted for every action on them, so long-lived lots are snapshotted more often than the default.
+    """
+
     def __str__(self):
-        return f"{self.code}"
+        return self.code
 
+    @classmethod
     def get_event_model(cls):
         return WineLotEventStore
 
@@ -62,8 +107,8 @@ class WineLot(AggregateModel):
         event = WineLotCreated(
             aggregate_id=cls.next_id(),
             code=code,
-            components=[ComponentAmount(component=comp, percent=percent) for comp, percent in composition.components.items()],
-            occurred_at=timezone.make_aware(datetime(year=1970, month=1, day=1, hour=0, minute=0, second=0)),
+            components=composition.component_amounts,
+            occurred_at=_CREATED_AT,
             # Force our creation event to the front of any stream as a default.
             # There are other, more complex, solutions to keep creation at the front, but are out of scope for now.
         )
@@ -74,28 +119,22 @@ class WineLot(AggregateModel):
 
         return instance
 
+    @_not_deleted("Cannot update a deleted wine lot.")
     def update(self, code: str):
-        if self.deleted_at is not None:
-            raise ValueError("Cannot update a deleted wine lot.")
-
         self._validate_code(code)
 
         event = WineLotUpdated(aggregate_id=self.id, code=ValueChange(before=self.code, after=code))
 
         self.apply(event)
 
+    @_not_deleted("Wine lot has already been deleted.")
     def destroy(self):
-        if self.deleted_at is not None:
-            raise ValueError("Wine lot has already been deleted.")
-
-        event = WineLotDeleted(aggregate_id=self.id, occurred_at=timezone.now())
+        event = WineLotDeleted(aggregate_id=self.id, occurred_at=timezone.now(), tombstone_suffix=secrets.token_hex(16))
 
         self.apply(event)
 
+    @_not_deleted("Cannot blend into a deleted wine lot.")
     def blend_in_volume(self, action_id: str, effective_at: datetime, volume_received: Decimal, volumes: dict[str, Decimal]):
-        if self.deleted_at is not None:
-            raise ValueError("Cannot blend into a deleted wine lot.")
-
         if volume_received <= 0:
             raise ValueError("Volume must be greater than zero.")
 
@@ -109,20 +148,17 @@ class WineLot(AggregateModel):
 
         self.apply(event)
 
+    @_not_deleted("Cannot adjust volume of a deleted wine lot.")
     def receive_volume(self, action_id: str, effective_at: datetime, volume: Decimal):
-        if self.deleted_at is not None:
-            raise ValueError("Cannot adjust volume of a deleted wine lot.")
-
         event = VolumeReceived(aggregate_id=self.id, action_id=action_id, occurred_at=effective_at, volume=volume)
 
         self.apply(event)
 
+    @_not_deleted("Cannot move volume from a deleted wine lot.")
     def move_volume(self, action_id: str, effective_at: datetime, volume: Decimal, to_wine_lot_id: str):
         """
         Move (subtract) volume from the wine lot to a different lot.
         """
-        if self.deleted_at is not None:
-            raise ValueError("Cannot move volume from a deleted wine lot.")
         if volume < 0:
             raise ValueError("Volume must be non-negative.")
 
@@ -136,16 +172,15 @@ class WineLot(AggregateModel):
 
         self.apply(event)
 
-    def validate_volume_moved_context(self, event: VolumeBottled):
-        if self.volume - event.volume < 0:
+    def validate_volume_moved_context(self, event: VolumeMoved):
+        if event.volume > self.volume:
             raise ValueError(f"Moved volume cannot exceed current volume. Current volume: {self.volume}, moved: {event.volume}")
 
+    @_not_deleted("Cannot re-measure a deleted wine lot.")
     def remeasure(self, action_id: str, effective_at: datetime, volume: Decimal):
         """
         Re-measure the volume of the wine lot.
         """
-        if self.deleted_at is not None:
-            raise ValueError("Cannot re-measure a deleted wine lot.")
         if volume < 0:
             raise ValueError("Volume must be non-negative.")
 
@@ -154,18 +189,16 @@ class WineLot(AggregateModel):
         self.apply(event)
 
     def validate_volume_bottled_context(self, event: VolumeBottled):
-        if self.volume - event.volume < 0:
+        if event.volume > self.volume:
             raise ValueError(
                 f"Bottled volume cannot exceed current volume. Current volume: {self.volume}, bottled: {event.volume}"
             )
 
+    @_not_deleted("Cannot bottle a deleted wine lot.")
     def bottle(self, action_id: str, effective_at: datetime, volume: Decimal):
         """
         Bottle the wine lot, adjusting the volume accordingly.
         """
-        if self.deleted_at is not None:
-            raise ValueError("Cannot bottle a deleted wine lot.")
-
         if volume <= 0:
             raise ValueError("Volume must be greater than zero.")
 
@@ -179,7 +212,7 @@ class WineLot(AggregateModel):
             raise ValueError("Code must be a non-empty string.")
         if len(code) < 2 or len(code) > 50:
             raise ValueError("Code must be between 2 and 50 characters long.")
-        if not re.match(_CODE_REGEX, code):
+        if not (code[0] in _CODE_END_CHARACTERS and code[-1] in _CODE_END_CHARACTERS and _CODE_CHARACTERS.issuperset(code)):
             raise ValueError("Code must consist of uppercase alphanumeric characters, hyphens, or underscores.")
 
     def apply_wine_lot_created(self, event: WineLotCreated):
@@ -190,8 +223,8 @@ class WineLot(AggregateModel):
         self.code = event.code.after
 
     def apply_wine_lot_deleted(self, event: WineLotDeleted):
-        self.code = f"{self.code}!{uuid.uuid4().hex}"
         # Apply a unique identifier to the code to allow it for reuse in the future.
+        self.code = f"{self.code}!{event.tombstone_suffix or uuid.uuid4().hex}"
 
         self.deleted_at = event.occurred_at
 
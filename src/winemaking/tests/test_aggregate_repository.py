@@ -0,0 +1,147 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import IntegrityError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ulid import ULID
+
+from eventsourcing import aggregate_repository
+from eventsourcing import models
+from eventsourcing.aggregate_repository import AggregateRepository
+from eventsourcing.aggregate_repository import store_aggregate_changes
+from winemaking.events.wine_lot import WineLotEventType
+from winemaking.models import WineLot
+from winemaking.models import WineLotEventStore
+from winemaking.types import Composition
+from winemaking.types import LotComponent
+from winemaking.use_cases.receive_volume import edit_receive_volume
+from winemaking.use_cases.receive_volume import record_receive_volume
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _new_wine_lot(code: str) -> WineLot:
+    return WineLot.create(
+        code=code,
+        composition=Composition(
+            components={
+                LotComponent(variety="Test", appellation="Test", vintage=2023): Decimal("1.0"),
+            },
+        ),
+    )
+
+
+@store_aggregate_changes
+def _create_wine_lot(code: str) -> WineLot:
+    return _new_wine_lot(code)
+
+
+@store_aggregate_changes
+def _add_wine_lot(lot: WineLot) -> WineLot:
+    AggregateRepository.current().add(lot)
+    return lot
+
+
+@store_aggregate_changes
+def _create_wine_lot_after_failed_receive(code: str) -> WineLot:
+    try:
+        record_receive_volume(lot_id="missing", volume=Decimal("1.00"))
+    except ValueError:
+        pass
+
+    return _new_wine_lot(code)
+
+
+def test_failed_inner_unit_of_work_can_be_recovered_from():
+    lot = _create_wine_lot_after_failed_receive("AR-RECOVERED")
+
+    assert WineLot.objects.get(pk=lot.pk).code == "AR-RECOVERED"
+
+
+def test_events_of_a_failed_unit_of_work_are_added_again():
+    _create_wine_lot("AR-TAKEN")
+    lot = _new_wine_lot("AR-TAKEN")
+    with pytest.raises(IntegrityError):
+        _add_wine_lot(lot)
+
+    lot.update(code="AR-RETRIED")
+    _add_wine_lot(lot)
+
+    event_types = WineLotEventStore.objects.filter(aggregate_id=lot.id).order_by("id").values_list("event_type", flat=True)
+    assert list(event_types) == [WineLotEventType.CREATED, WineLotEventType.UPDATED]
+
+
+def test_store_inserts_many_events_with_unnest(monkeypatch):
+    monkeypatch.setattr(models, "_UNNEST_INSERT_THRESHOLD", 1)
+    lot = _new_wine_lot("AR-UNNEST")
+    start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+    for minute in range(3):
+        lot.receive_volume(action_id=str(ULID()), effective_at=start + timedelta(minutes=minute), volume=Decimal("1.50"))
+    events = lot.get_recorded_events()
+
+    WineLotEventStore.objects.store(events)
+
+    stored = list(WineLotEventStore.objects.filter(aggregate_id=lot.id).order_by("id"))
+    assert len({event_model.id for event_model in stored}) == len(events)
+    assert [event_model.get_event_data() for event_model in stored] == events
+    assert [event_model.occurred_at for event_model in stored] == [getattr(event, "occurred_at") for event in events]
+    assert [event_model.sequence_number for event_model in stored] == [
+        getattr(event, "sequence_number", None) for event in events
+    ]
+
+
+def test_edit_deletes_many_edited_events_with_unnest(monkeypatch):
+    monkeypatch.setattr(aggregate_repository, "_UNNEST_DELETE_THRESHOLD", 0)
+    lot = _create_wine_lot("AR-UNNEST-DELETE")
+    action = record_receive_volume(lot_id=lot.id, volume=Decimal("5.00"), effective_at=timezone.now() - timedelta(hours=1))
+    record_receive_volume(lot_id=lot.id, volume=Decimal("2.00"))
+
+    edit_receive_volume(action_id=action.id, lot_id=lot.id, volume=Decimal("7.00"))
+
+    assert WineLot.objects.get(id=lot.id).volume == Decimal("9.00")
+    volumes = [
+        event_model.get_event_data().volume
+        for event_model in WineLotEventStore.objects.filter(aggregate_id=lot.id, event_type=WineLotEventType.VOLUME_RECEIVED)
+    ]
+    assert sorted(volumes) == [Decimal("2.00"), Decimal("7.00")]
+
+
+@store_aggregate_changes
+def _get_wine_lot_twice(lot_id: str) -> tuple[WineLot, WineLot, int]:
+    repository = AggregateRepository.current()
+    first = repository.get(WineLot, lot_id)
+    with CaptureQueriesContext(connection) as queries:
+        second = repository.get(WineLot, lot_id)
+    return first, second, len(queries)
+
+
+def test_get_returns_the_loaded_aggregate_without_another_query():
+    lot = _create_wine_lot("AR-IDENTITY")
+
+    first, second, query_count = _get_wine_lot_twice(lot.id)
+
+    assert first is second
+    assert first.code == "AR-IDENTITY"
+    assert query_count == 0
+
+
+@store_aggregate_changes
+def _get_created_and_persisted_wine_lots(lot_id: str) -> tuple[WineLot, dict[str, WineLot], int]:
+    created = _new_wine_lot("AR-IDENTITY-NEW")
+    with CaptureQueriesContext(connection) as queries:
+        lots = AggregateRepository.current().get_many(WineLot, [created.id, lot_id, "missing"])
+    return created, lots, len(queries)
+
+
+def test_get_many_returns_changed_aggregates_and_loads_the_rest_together():
+    lot = _create_wine_lot("AR-IDENTITY-PERSISTED")
+
+    created, lots, query_count = _get_created_and_persisted_wine_lots(lot.id)
+
+    assert lots.keys() == {created.id, lot.id}
+    assert lots[created.id] is created
+    assert lots[lot.id].code == "AR-IDENTITY-PERSISTED"
+    assert query_count == 1
@@ -1,10 +1,13 @@
+from datetime import timedelta
 from decimal import Decimal
 
 import pytest
+from django.utils import timezone
 
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from winemaking.models import WineLot
 from winemaking.models.action import Action
+from winemaking.models.action import ActionEventStore
 from winemaking.types import ActionType
 from winemaking.types import Composition
 from winemaking.types import LotComponent
@@ -130,3 +133,42 @@ def test_it_blends_with_losses():
     # Ensure the blended composition is correct
     refetched_receiving = WineLot.objects.get(id=receiving.id)
     assert refetched_receiving.volume == Decimal("9.00")  # 5.00 original + 4.00 blended in
+
+
+def test_stored_blend_events_are_not_shared_between_loads():
+    receiving = _create_wine_lot(code="BL-REC3", vintage=2022)
+    blended = _create_wine_lot(code="BL-BLD3", vintage=2023)
+
+    record_receive_volume(lot_id=blended.id, volume=Decimal("10.00"))
+    action = record_blend_lot(lot_id=receiving.id, blend_volumes={blended.id: Decimal("5.00")}, blended_volume=Decimal("5.00"))
+
+    first = ActionEventStore.objects.get(aggregate_id=action.id).get_event_data()
+    first.details.blend_volumes[blended.id] = Decimal("1.00")
+
+    second = ActionEventStore.objects.get(aggregate_id=action.id).get_event_data()
+    assert second.details.blend_volumes == {blended.id: Decimal("5.00")}
+
+
+def test_backdated_blend_reapplies_downstream_events_of_every_lot():
+    receiving = _create_wine_lot(code="BL-REC4", vintage=2022)
+    blended1 = _create_wine_lot(code="BL-BLD4A", vintage=2023)
+    blended2 = _create_wine_lot(code="BL-BLD4B", vintage=2024)
+    now = timezone.now()
+
+    record_receive_volume(lot_id=receiving.id, volume=Decimal("5.00"), effective_at=now - timedelta(hours=3))
+    record_receive_volume(lot_id=blended1.id, volume=Decimal("10.00"), effective_at=now - timedelta(hours=3))
+    record_receive_volume(lot_id=blended2.id, volume=Decimal("10.00"), effective_at=now - timedelta(hours=3))
+    record_receive_volume(lot_id=receiving.id, volume=Decimal("3.00"), effective_at=now - timedelta(hours=1))
+    record_receive_volume(lot_id=blended1.id, volume=Decimal("1.00"), effective_at=now - timedelta(hours=1))
+    record_receive_volume(lot_id=blended2.id, volume=Decimal("2.00"), effective_at=now - timedelta(hours=1))
+
+    record_blend_lot(
+        lot_id=receiving.id,
+        blend_volumes={blended1.id: Decimal("4.00"), blended2.id: Decimal("6.00")},
+        blended_volume=Decimal("10.00"),
+        effective_at=now - timedelta(hours=2),
+    )
+
+    assert WineLot.objects.get(id=receiving.id).volume == Decimal("18.00")
+    assert WineLot.objects.get(id=blended1.id).volume == Decimal("7.00")
+    assert WineLot.objects.get(id=blended2.id).volume == Decimal("6.00")
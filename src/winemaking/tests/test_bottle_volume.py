@@ -4,6 +4,7 @@ from decimal import Decimal
 import pytest
 from django.utils import timezone
 
+from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from winemaking.models import WineLotEventStore
 from winemaking.models.action import Action
@@ -30,6 +31,11 @@ def _create_wine_lot(code: str) -> WineLot:
     )
 
 
+@store_aggregate_changes
+def _delete_action(action_id: str):
+    AggregateRepository.current().get(Action, action_id).destroy()
+
+
 def test_record_bottle_volume_raises_for_missing_lot():
     with pytest.raises(ValueError, match=r"Wine lot with ID missing does not exist\."):
         record_bottle_volume(lot_id="missing", volume_bottled=Decimal("1.00"), bottles=1)
@@ -126,3 +132,13 @@ def test_edit_bottle_volume_move_to_other_lot():
 def test_edit_bottle_volume_raises_for_missing_action():
     with pytest.raises(ValueError, match=r"Action with ID missing does not exist\."):
         edit_bottle_volume(action_id="missing", lot_id="irrelevant", volume_bottled=Decimal("1.00"), bottles=1)
+
+
+def test_edit_bottle_volume_without_changes_raises_for_deleted_action():
+    lot = _create_wine_lot(code="BV-NOOP-DEL")
+    record_receive_volume(lot_id=lot.id, volume=Decimal("10.00"))
+    action = record_bottle_volume(lot_id=lot.id, volume_bottled=Decimal("4.00"), bottles=5)
+    _delete_action(action.id)
+
+    with pytest.raises(ValueError, match=r"Cannot edit a deleted action\."):
+        edit_bottle_volume(action_id=action.id, lot_id=lot.id, volume_bottled=Decimal("4.00"), bottles=5)
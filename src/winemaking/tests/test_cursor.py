@@ -0,0 +1,118 @@
+from decimal import Decimal
+from importlib import import_module
+
+import pytest
+
+from eventsourcing.aggregate_repository import store_aggregate_changes
+from lib.db.iterators.cursor import cursor
+from winemaking.models import WineLot
+from winemaking.models.wine_lot import WineLotComponent
+from winemaking.types import ComponentAmount
+from winemaking.types import Composition
+from winemaking.types import LotComponent
+
+pytestmark = [pytest.mark.django_db]
+
+# The package exports the function under the same name as its module, so the module is imported by name.
+cursor_module = import_module("lib.db.iterators.cursor")
+
+
+@store_aggregate_changes
+def _create_wine_lot(code: str) -> WineLot:
+    return WineLot.create(
+        code=code,
+        composition=Composition(
+            components={
+                LotComponent(variety="Test", appellation="Test", vintage=2023): Decimal("1.0"),
+            },
+        ),
+    )
+
+
+@pytest.fixture
+def lots() -> list[WineLot]:
+    # Several lots share each volume, so pages can only be split correctly by using the tiebreaker.
+    volumes = [Decimal("1.00"), Decimal("1.00"), Decimal("1.00"), Decimal("2.00"), Decimal("2.00"), Decimal("3.00")]
+    lots = []
+    for index, volume in enumerate(volumes):
+        lot = _create_wine_lot(f"CUR-{index}")
+        WineLot.objects.filter(pk=lot.pk).update(volume=volume)
+        lots.append(WineLot.objects.get(pk=lot.pk))
+    return lots
+
+
+@pytest.fixture
+def row_comparisons(monkeypatch) -> list:
+    calls = []
+    row_comparison = cursor_module._row_comparison
+
+    def spy(*args):
+        calls.append(args)
+        return row_comparison(*args)
+
+    monkeypatch.setattr(cursor_module, "_row_comparison", spy)
+    return calls
+
+
+def test_cursor_pages_ascending_with_duplicate_values(lots, row_comparisons):
+    expected = sorted(lots, key=lambda lot: (lot.volume, lot.pk))
+
+    assert list(cursor(WineLot.objects.all(), "volume", "id", size=2)) == expected
+    assert row_comparisons
+
+
+def test_cursor_pages_descending_with_duplicate_values(lots, row_comparisons):
+    expected = sorted(lots, key=lambda lot: (lot.volume, lot.pk), reverse=True)
+
+    assert list(cursor(WineLot.objects.all(), "-volume", "-id", size=2)) == expected
+    assert row_comparisons
+
+
+def test_cursor_pages_in_mixed_directions_without_row_comparison(lots, row_comparisons):
+    expected = sorted(sorted(lots, key=lambda lot: lot.pk, reverse=True), key=lambda lot: lot.volume)
+
+    assert list(cursor(WineLot.objects.all(), "volume", "-id", size=2)) == expected
+    assert not row_comparisons
+
+
+def test_cursor_returns_values(lots):
+    rows = list(cursor(WineLot.objects.all(), "volume", "id", size=4, values=["code"]))
+
+    expected = sorted(lots, key=lambda lot: (lot.volume, lot.pk))
+    assert rows == [{"code": lot.code, "volume": lot.volume, "id": lot.pk} for lot in expected]
+
+
+def test_cursor_defers_fields_not_in_only(lots):
+    results = list(cursor(WineLot.objects.all(), "volume", "id", size=4, only=["code"]))
+
+    assert [lot.pk for lot in results] == [lot.pk for lot in sorted(lots, key=lambda lot: (lot.volume, lot.pk))]
+    assert results[0].get_deferred_fields() == {"deleted_at", "version"}
+
+
+@pytest.fixture
+def components() -> list[WineLotComponent]:
+    # The codes sort in the opposite order to the IDs, so paging by the code rather than the ID would skip rows.
+    components = []
+    for code in ["CUR-FK-Z", "CUR-FK-M", "CUR-FK-A"]:
+        lot = _create_wine_lot(code)
+        for variety in ["First", "Second"]:
+            components.append(
+                WineLotComponent.objects.create(
+                    wine_lot=lot,
+                    component=ComponentAmount(
+                        component=LotComponent(variety=variety, appellation="Test", vintage=2023), percent=Decimal("50.00")
+                    ),
+                    percent=Decimal("50.00"),
+                )
+            )
+    return components
+
+
+def test_cursor_pages_by_foreign_key(components, row_comparisons):
+    expected = sorted(components, key=lambda component: (component.wine_lot_id, component.pk))
+
+    assert list(cursor(WineLotComponent.objects.all(), "wine_lot", "id", size=1)) == expected
+    assert row_comparisons
+
+    rows = list(cursor(WineLotComponent.objects.all(), "wine_lot", "id", size=1, values=["percent"]))
+    assert [row["id"] for row in rows] == [component.pk for component in expected]
@@ -0,0 +1,90 @@
+import pytest
+
+from eventsourcing.notification_bus import LocalNotificationBus
+from eventsourcing.notifications import Notification
+from eventsourcing.notifications import Subscriber
+
+
+class LotNotified(Notification):
+    def __init__(self, number: int):
+        self.number = number
+
+
+class Lots:
+    class Nested(Notification):
+        pass
+
+
+class RecordingSubscriber(Subscriber):
+    handled: list[Notification] = []
+
+    def handle(self, event: Notification):
+        self.handled.append(event)
+
+
+class BatchingSubscriber(Subscriber):
+    batches: list[list[Notification]] = []
+
+    def handle_batch(self, events: list[Notification]):
+        self.batches.append(events)
+
+
+class StatefulSubscriber(Subscriber):
+    stateful = True
+    instances: list["StatefulSubscriber"] = []
+
+    def __init__(self):
+        self.events = []
+        self.instances.append(self)
+
+    def handle(self, event: Notification):
+        self.events.append(event)
+
+
+def _fqdn(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+@pytest.fixture
+def bus(settings) -> LocalNotificationBus:
+    RecordingSubscriber.handled = []
+    BatchingSubscriber.batches = []
+    StatefulSubscriber.instances = []
+    settings.BUSES_NOTIFICATION_SUBSCRIBERS = {
+        _fqdn(LotNotified): [_fqdn(BatchingSubscriber), _fqdn(StatefulSubscriber)],
+        _fqdn(Lots.Nested): [_fqdn(RecordingSubscriber)],
+    }
+    return LocalNotificationBus()
+
+
+def test_dispatch_resolves_nested_notification_classes(bus):
+    event = Lots.Nested()
+
+    bus.dispatch(event)
+
+    assert RecordingSubscriber.handled == [event]
+
+
+def test_dispatch_all_batches_consecutive_notifications(bus):
+    first, second, third = LotNotified(1), LotNotified(2), LotNotified(3)
+    nested = Lots.Nested()
+
+    bus.dispatch_all([first, second, nested, third])
+
+    assert BatchingSubscriber.batches == [[first, second], [third]]
+    assert RecordingSubscriber.handled == [nested]
+
+
+def test_stateful_subscribers_get_an_instance_per_notification(bus):
+    first, second = LotNotified(1), LotNotified(2)
+
+    bus.dispatch_all([first, second])
+
+    assert [subscriber.events for subscriber in StatefulSubscriber.instances] == [[first], [second]]
+
+
+def test_boot_raises_for_missing_notification_classes(settings):
+    settings.BUSES_NOTIFICATION_SUBSCRIBERS = {f"{__name__}.Lots.Missing": [_fqdn(RecordingSubscriber)]}
+
+    with pytest.raises(ImportError, match=rf"Module {__name__} does not define Lots\.Missing\."):
+        LocalNotificationBus().boot()
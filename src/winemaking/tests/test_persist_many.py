@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import pytest
+from django.db import transaction
+
+from eventsourcing.models import OutOfDateVersionException
+from winemaking.models import WineLot
+from winemaking.types import Composition
+from winemaking.types import LotComponent
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _new_wine_lot(code: str) -> WineLot:
+    return WineLot.create(
+        code=code,
+        composition=Composition(
+            components={
+                LotComponent(variety="Test", appellation="Test", vintage=2023): Decimal("1.0"),
+            },
+        ),
+    )
+
+
+def _persisted_wine_lot(code: str) -> WineLot:
+    lot = _new_wine_lot(code)
+    with transaction.atomic():
+        WineLot.persist_many([lot])
+    return WineLot.objects.get(pk=lot.pk)
+
+
+def test_persist_many_creates_and_updates_in_one_batch():
+    existing = _persisted_wine_lot("PM-EXISTING")
+    existing.update(code="PM-UPDATED")
+    created = _new_wine_lot("PM-CREATED")
+
+    with transaction.atomic():
+        WineLot.persist_many([existing, created])
+
+    assert existing.version == 2
+    assert created.version == 1
+    assert dict(WineLot.objects.values_list("code", "version")) == {"PM-UPDATED": 2, "PM-CREATED": 1}
+
+
+def test_persist_many_raises_for_out_of_date_versions():
+    lot = _persisted_wine_lot("PM-STALE")
+    WineLot.objects.filter(pk=lot.pk).update(version=2)
+    lot.update(code="PM-STALE-UPDATED")
+
+    with pytest.raises(OutOfDateVersionException), transaction.atomic():
+        WineLot.persist_many([lot])
+
+    assert WineLot.objects.get(pk=lot.pk).code == "PM-STALE"
+
+
+def test_persist_many_raises_for_duplicate_aggregates():
+    lot = _persisted_wine_lot("PM-DUPLICATE")
+    duplicate = WineLot.objects.get(pk=lot.pk)
+
+    with pytest.raises(ValueError, match="Cannot persist the same wine lot more than once in a batch."):
+        with transaction.atomic():
+            WineLot.persist_many([lot, duplicate])
+
+    assert WineLot.objects.get(pk=lot.pk).version == 1
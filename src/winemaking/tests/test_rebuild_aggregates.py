@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+
+from eventsourcing.aggregate_repository import store_aggregate_changes
+from eventsourcing.aggregates import rebuild_aggregates
+from winemaking.models import WineLot
+from winemaking.types import Composition
+from winemaking.types import LotComponent
+from winemaking.use_cases.receive_volume import record_receive_volume
+
+
+@store_aggregate_changes
+def _create_wine_lot(code: str) -> WineLot:
+    return WineLot.create(
+        code=code,
+        composition=Composition(
+            components={
+                LotComponent(variety="Test", appellation="Test", vintage=2023): Decimal("1.0"),
+            },
+        ),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_aggregates_in_parallel_restores_every_lot():
+    volumes = {}
+    for index in range(5):
+        lot = _create_wine_lot(f"RB-{index}")
+        record_receive_volume(lot_id=lot.id, volume=Decimal(index + 1))
+        volumes[lot.id] = Decimal(index + 1)
+    WineLot.objects.update(volume=Decimal("99.00"))
+
+    chunks = []
+    rebuild_aggregates(WineLot, chunk_size=2, workers=2, chunk_callback=chunks.append)
+
+    assert dict(WineLot.objects.values_list("id", "volume")) == volumes
+    assert sorted(chunks) == [1, 2, 3]
+
+
+@pytest.mark.django_db
+def test_rebuild_aggregates_in_parallel_raises_inside_a_transaction():
+    _create_wine_lot("RB-ATOMIC")
+
+    with pytest.raises(TransactionManagementError, match="more than one worker inside a transaction"):
+        with transaction.atomic():
+            rebuild_aggregates(WineLot, workers=2)
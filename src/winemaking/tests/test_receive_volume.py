@@ -4,6 +4,7 @@ from decimal import Decimal
 import pytest
 from django.utils import timezone
 
+from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from winemaking.models import WineLotEventStore
 from winemaking.models.action import Action
@@ -13,6 +14,7 @@ from winemaking.types import Composition
 from winemaking.types import LotComponent
 from winemaking.use_cases.receive_volume import edit_receive_volume
 from winemaking.use_cases.receive_volume import record_receive_volume
+from winemaking.use_cases.receive_volume import record_receive_volumes
 
 pytestmark = [pytest.mark.django_db]
 
@@ -29,6 +31,11 @@ def _create_wine_lot(code: str) -> WineLot:
     )
 
 
+@store_aggregate_changes
+def _delete_action(action_id: str):
+    AggregateRepository.current().get(Action, action_id).destroy()
+
+
 def test_record_receive_volume_raises_for_missing_lot():
     with pytest.raises(ValueError, match=r"Wine lot with ID missing does not exist\."):
         record_receive_volume(lot_id="missing", volume=Decimal("1.00"))
@@ -51,6 +58,17 @@ def test_record_receive_volume_happy_path():
     assert action.effective_at is not None
 
 
+def test_record_receive_volumes_records_each_volume():
+    lot = _create_wine_lot(code="RV-BATCH")
+
+    actions = record_receive_volumes(lot_id=lot.id, volumes=[Decimal("10.00"), Decimal("5.00")])
+
+    assert len(actions) == 2
+    assert WineLot.objects.get(id=lot.id).volume == Decimal("15.00")
+    assert Action.objects.count() == 2
+    assert WineLotEventStore.objects.filter(aggregate_id=lot.id).count() == 3
+
+
 def test_record_receive_volume_backdated_reapplies():
     lot = _create_wine_lot(code="RV-2")
     events = WineLotEventStore.objects.filter(aggregate_id=lot.id).all()
@@ -88,6 +106,17 @@ def test_edit_receive_volume_change_volume_same_lot():
     assert action.updated_at is not None
 
 
+def test_edit_receive_volume_without_changes_is_skipped():
+    lot = _create_wine_lot(code="EV-NOOP")
+    action = record_receive_volume(lot_id=lot.id, volume=Decimal("10.00"))
+
+    edit_receive_volume(action_id=action.id, lot_id=lot.id, volume=Decimal("10.00"))
+
+    action.refresh_from_db()
+    assert action.revision_number == 0
+    assert WineLot.objects.get(id=lot.id).volume == Decimal("10.00")
+
+
 def test_edit_receive_volume_move_to_other_lot():
     lot_a = _create_wine_lot(code="EV-2A")
     lot_b = _create_wine_lot(code="EV-2B")
@@ -120,3 +149,12 @@ def test_edit_receive_volume_raises_for_missing_lot():
 
     with pytest.raises(ValueError, match=r"Wine lot with ID missing does not exist\."):
         edit_receive_volume(action_id=rv_action.id, lot_id="missing", volume=Decimal("2.00"))
+
+
+def test_edit_receive_volume_without_changes_raises_for_deleted_action():
+    lot = _create_wine_lot(code="EV-NOOP-DEL")
+    action = record_receive_volume(lot_id=lot.id, volume=Decimal("10.00"))
+    _delete_action(action.id)
+
+    with pytest.raises(ValueError, match=r"Cannot edit a deleted action\."):
+        edit_receive_volume(action_id=action.id, lot_id=lot.id, volume=Decimal("10.00"))
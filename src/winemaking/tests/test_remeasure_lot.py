@@ -4,6 +4,7 @@ from decimal import Decimal
 import pytest
 from django.utils import timezone
 
+from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from winemaking.models import WineLotEventStore
 from winemaking.models.action import Action
@@ -29,6 +30,11 @@ def _create_wine_lot(code: str) -> WineLot:
     )
 
 
+@store_aggregate_changes
+def _delete_action(action_id: str):
+    AggregateRepository.current().get(Action, action_id).destroy()
+
+
 def test_record_remeasure_lot_raises_for_missing_lot():
     with pytest.raises(ValueError, match=r"Wine lot with ID missing does not exist\."):
         record_remeasure_lot(lot_id="missing", volume=Decimal("1.00"))
@@ -121,3 +127,12 @@ def test_edit_remeasure_lot_raises_for_missing_lot():
 
     with pytest.raises(ValueError, match=r"Wine lot with ID missing does not exist\."):
         edit_remeasure_lot(action_id=rv_action.id, lot_id="missing", volume=Decimal("2.00"))
+
+
+def test_edit_remeasure_lot_without_changes_raises_for_deleted_action():
+    lot = _create_wine_lot(code="RM-NOOP-DEL")
+    action = record_remeasure_lot(lot_id=lot.id, volume=Decimal("10.00"))
+    _delete_action(action.id)
+
+    with pytest.raises(ValueError, match=r"Cannot edit a deleted action\."):
+        edit_remeasure_lot(action_id=action.id, lot_id=lot.id, volume=Decimal("10.00"))
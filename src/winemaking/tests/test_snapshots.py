@@ -0,0 +1,87 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from eventsourcing.aggregate_repository import store_aggregate_changes
+from eventsourcing.aggregates import load_aggregate_states_before
+from eventsourcing.aggregates import rebuild_aggregates
+from winemaking.models import WineLot
+from winemaking.models.wine_lot import WineLotSnapshot
+from winemaking.types import Composition
+from winemaking.types import LotComponent
+from winemaking.use_cases.receive_volume import record_receive_volume
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def snapshot_every_other_version(monkeypatch):
+    monkeypatch.setattr(WineLot, "snapshot_every_versions", 2)
+
+
+@store_aggregate_changes
+def _create_wine_lot(code: str) -> WineLot:
+    return WineLot.create(
+        code=code,
+        composition=Composition(
+            components={
+                LotComponent(variety="Test", appellation="Test", vintage=2023): Decimal("1.0"),
+            },
+        ),
+    )
+
+
+def _create_snapshotted_wine_lot(code: str) -> WineLot:
+    lot = _create_wine_lot(code)
+    record_receive_volume(lot_id=lot.id, volume=Decimal("5.00"))
+    record_receive_volume(lot_id=lot.id, volume=Decimal("3.00"))
+    return WineLot.objects.get(id=lot.id)
+
+
+def test_snapshot_is_taken_at_multiples_of_the_version():
+    lot = _create_snapshotted_wine_lot("SN-TAKEN")
+
+    snapshot = WineLotSnapshot.objects.get(aggregate_id=lot.id)
+    assert snapshot.version == 2
+    assert Decimal(snapshot.state_data["volume"]) == Decimal("5.00")
+
+
+def test_loads_start_from_the_latest_snapshot():
+    lot = _create_snapshotted_wine_lot("SN-LOAD")
+    snapshot = WineLotSnapshot.objects.get(aggregate_id=lot.id)
+    # Change the snapshot so that it shows whether it was used rather than the events before it
+    WineLotSnapshot.objects.filter(pk=snapshot.pk).update(state_data={**snapshot.state_data, "volume": "100.00"})
+
+    states = load_aggregate_states_before([lot], occurred_at=timezone.now() + timedelta(seconds=1))
+    assert states[lot.id].volume == Decimal("103.00")
+
+    rebuild_aggregates(WineLot, model_id=lot.id)
+    assert WineLot.objects.get(id=lot.id).volume == Decimal("103.00")
+
+
+def test_rebuild_from_snapshot_matches_full_replay():
+    lot = _create_snapshotted_wine_lot("SN-REPLAY")
+
+    rebuild_aggregates(WineLot, model_id=lot.id)
+    from_snapshot = WineLot.objects.get(id=lot.id)
+
+    WineLotSnapshot.objects.filter(aggregate_id=lot.id).delete()
+    rebuild_aggregates(WineLot, model_id=lot.id)
+    from_events = WineLot.objects.get(id=lot.id)
+
+    assert from_snapshot.save_snapshot() == from_events.save_snapshot()
+
+
+def test_backdated_action_before_snapshot_invalidates_it():
+    lot = _create_snapshotted_wine_lot("SN-BACKDATED")
+    snapshot = WineLotSnapshot.objects.get(aggregate_id=lot.id)
+
+    record_receive_volume(lot_id=lot.id, volume=Decimal("2.00"), effective_at=timezone.now() - timedelta(hours=1))
+
+    assert not WineLotSnapshot.objects.filter(pk=snapshot.pk).exists()
+    latest = WineLotSnapshot.objects.get(aggregate_id=lot.id)
+    assert latest.version == 4
+    assert Decimal(latest.state_data["volume"]) == Decimal("10.00")
+    assert WineLot.objects.get(id=lot.id).volume == Decimal("10.00")
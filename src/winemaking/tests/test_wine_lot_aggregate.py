@@ -38,6 +38,26 @@ def test_destroy_wine_lot(simple_composition):
     assert lot.deleted_at is not None
 
 
+def test_deleted_wine_lot_cannot_be_changed(simple_composition):
+    lot = WineLot.create(code="LOT001", composition=simple_composition)
+    lot.destroy()
+    with pytest.raises(ValueError, match="Cannot adjust volume of a deleted wine lot."):
+        lot.receive_volume(action_id=str(ULID()), effective_at=timezone.now(), volume=Decimal("10.0"))
+    with pytest.raises(ValueError, match="Wine lot has already been deleted."):
+        lot.destroy()
+
+
+def test_replayed_wine_lot_deletion_keeps_code(simple_composition):
+    lot = WineLot.create(code="LOT001", composition=simple_composition)
+    lot.destroy()
+    assert lot.code.startswith("LOT001!")
+
+    replayed = WineLot()
+    for event in lot.get_recorded_events():
+        replayed.load(event)
+    assert replayed.code == lot.code
+
+
 def test_blend_in_volume_adds_correctly(simple_composition):
     lot = WineLot.create(code="LOT001", composition=simple_composition)
     lot.receive_volume(action_id=str(ULID()), effective_at=timezone.now(), volume=Decimal("100.0"))
@@ -49,3 +69,14 @@ def test_blend_in_volume_adds_correctly(simple_composition):
     )
     # Expect the volume to have increased by 50 (simple add; adjust if logic is fancier!)
     assert lot.volume == Decimal("150.0")
+
+
+def test_wine_lot_snapshot_restores_state(simple_composition):
+    lot = WineLot.create(code="LOT001", composition=simple_composition)
+    lot.receive_volume(action_id=str(ULID()), effective_at=timezone.now(), volume=Decimal("100.0"))
+
+    restored = lot.identity()
+    restored.load_snapshot(lot.save_snapshot())
+    assert restored.code == "LOT001"
+    assert restored.volume == Decimal("100.0")
+    assert restored.deleted_at is None
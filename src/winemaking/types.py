@@ -1,10 +1,16 @@
 from decimal import Decimal
+from functools import cached_property
 
 from django.db.models.enums import TextChoices
 from pydantic import BaseModel
+from pydantic import ConfigDict
 from pydantic import Field
 from pydantic import model_validator
 
+_MIN_TOTAL_PERCENTAGE = Decimal("0.9999")
+_MAX_TOTAL_PERCENTAGE = Decimal("1.0001")
+"""The bounds that the percentages of a composition must total between, allowing for decimal precision issues."""
+
 
 class ActionType(TextChoices):
     RECEIVE_VOLUME = "RECEIVE_VOLUME"
@@ -14,6 +20,12 @@ class ActionType(TextChoices):
 
 
 class LotComponent(BaseModel):
+    """
+    A component of a wine lot, used as a key of compositions, so it is frozen to keep its hash stable.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
     variety: str
     appellation: str
     vintage: int = Field(..., ge=1900, le=2100)
@@ -29,16 +41,30 @@ class LotComponent(BaseModel):
 
 
 class Composition(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     components: dict[LotComponent, Decimal] = Field(default_factory=dict)
 
     @model_validator(mode="after")
     def validate_percentages(cls, obj):
         total = sum(percent for percent in obj.components.values())
         # Check tolerance for floating point/decimal precision issues
-        if not (Decimal("0.9999") < total < Decimal("1.0001")):
+        if not (_MIN_TOTAL_PERCENTAGE < total < _MAX_TOTAL_PERCENTAGE):
             raise ValueError(f"Total percentage must be 100 but got {total * 100:.2f}%")
         return obj
 
+    @cached_property
+    def component_amounts(self) -> tuple["ComponentAmount", ...]:
+        """
+        The components of the composition as component amounts, built once for each composition.
+
+        Compositions are often reused to create many lots, for example when importing lots. The components and their
+        percentages have already been validated by the composition, so they are not validated again.
+        """
+        return tuple(
+            ComponentAmount.model_construct(component=comp, percent=percent) for comp, percent in self.components.items()
+        )
+
 
 class ComponentAmount(BaseModel):
     """
@@ -0,0 +1,10 @@
+from datetime import timedelta
+
+BACKDATING_MARGIN = timedelta(seconds=2)
+"""How far in the past an effective date must be for the action to be recorded as backdated."""
+
+ONE_SECOND = timedelta(seconds=1)
+"""
+Backdated actions load the lots as they were a second after the effective date, so that the action comes after any
+events that occurred at the same time.
+"""
@@ -1,18 +1,20 @@
 from datetime import datetime
-from datetime import timedelta
 from decimal import Decimal
 from typing import cast
 
 from django.utils import timezone
 
+from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from eventsourcing.aggregates import load_editable_aggregates_at_time
 from eventsourcing.aggregates import load_editable_aggregates_at_time_and_point
-from eventsourcing.aggregates import reapply_downstream_events_from
+from eventsourcing.aggregates import reapply_downstream_events_from_many
 from winemaking.models import Action
 from winemaking.models import BlendData
 from winemaking.models import WineLot
 from winemaking.types import ActionType
+from winemaking.use_cases._backdating import BACKDATING_MARGIN
+from winemaking.use_cases._backdating import ONE_SECOND
 
 
 @store_aggregate_changes
@@ -21,24 +23,21 @@ def record_blend_lot(
 ) -> Action:
     if effective_at is not None:
         effective_at = effective_at.replace(microsecond=0)
-        if effective_at > timezone.now() - timedelta(seconds=2):
+        if effective_at > timezone.now() - BACKDATING_MARGIN:
             raise ValueError("Effective date must be functionally in the past if provided.")
 
-    lots = WineLot.objects.filter(id__in=[lot_id] + list(blend_volumes.keys())).all()
+    lots = AggregateRepository.current().get_many(WineLot, [lot_id] + list(blend_volumes.keys()))
     if len(lots) != len(blend_volumes) + 1:
-        existing_ids = {lot.id for lot in lots}
-        missing_ids = [lid for lid in [lot_id] + list(blend_volumes.keys()) if lid not in existing_ids]
+        missing_ids = [lid for lid in [lot_id] + list(blend_volumes.keys()) if lid not in lots]
         raise ValueError(f"Wine lots with IDs {', '.join(missing_ids)} do not exist.")
 
     is_backdated = effective_at is not None
 
     if is_backdated:
-        lots = load_editable_aggregates_at_time(lots, occurred_at=effective_at + timedelta(seconds=1))
-    else:
-        lots = {lot.id: lot for lot in lots}
+        lots = load_editable_aggregates_at_time(lots.values(), occurred_at=effective_at + ONE_SECOND)
 
     action = Action.record_blend(
-        blend_volumes={lots[blended_lot_id]: volume for blended_lot_id, volume in blend_volumes.items()},
+        blend_volumes=blend_volumes,
         receiving_wine_lot=lots[lot_id],
         blended_volume=blended_volume,
         effective_at=effective_at,
@@ -47,30 +46,28 @@ def record_blend_lot(
     _process_action(action, lots)
 
     if is_backdated:
-        for lot in lots.values():
-            reapply_downstream_events_from(aggregate=lot, occurred_at=action.effective_at, sequence_number=action.id)
+        reapply_downstream_events_from_many(lots.values(), occurred_at=action.effective_at, sequence_number=action.id)
 
     return action
 
 
 @store_aggregate_changes
 def edit_blend_lot(action_id: str, lot_id: str, blend_volumes: dict[WineLot, Decimal], blended_volume: Decimal) -> Action:
-    action = Action.objects.filter(id=action_id).first()
+    action = AggregateRepository.current().get(Action, action_id)
     if not action:
         raise ValueError(f"Action with ID {action_id} does not exist.")
 
     if action.action_type != ActionType.BLEND:
         raise ValueError(f"Action with ID {action_id} is not of type BLEND.")
 
-    lots = [lot_id] + list(blend_volumes.keys())
-    existing_lots = WineLot.objects.filter(id__in=[lot.id for lot in lots]).all()
-    if len(existing_lots) != len(lots):
-        existing_ids = {lot.id for lot in existing_lots}
-        missing_ids = [lot.id for lot in lots if lot.id not in existing_ids]
+    lot_ids = [lot_id] + [lot.id for lot in blend_volumes]
+    existing_lots = AggregateRepository.current().get_many(WineLot, lot_ids)
+    if len(existing_lots) != len(lot_ids):
+        missing_ids = [lid for lid in lot_ids if lid not in existing_lots]
         raise ValueError(f"Wine lots with IDs {', '.join(missing_ids)} do not exist.")
 
     lots_by_id = load_editable_aggregates_at_time_and_point(
-        existing_lots, occurred_at=action.effective_at, sequence_number=action.id
+        existing_lots.values(), occurred_at=action.effective_at, sequence_number=action.id
     )
 
     action = action.edit_blend(
@@ -81,8 +78,7 @@ def edit_blend_lot(action_id: str, lot_id: str, blend_volumes: dict[WineLot, Dec
 
     _process_action(action, lots_by_id)
 
-    for lot in lots_by_id.values():
-        reapply_downstream_events_from(aggregate=lot, occurred_at=action.effective_at, sequence_number=action.id)
+    reapply_downstream_events_from_many(lots_by_id.values(), occurred_at=action.effective_at, sequence_number=action.id)
 
     return action
 
@@ -1,35 +1,38 @@
 from datetime import datetime
-from datetime import timedelta
 from decimal import Decimal
 from typing import cast
 
 from django.utils import timezone
 
+from eventsourcing.aggregate_repository import AggregateRepository
 from eventsourcing.aggregate_repository import store_aggregate_changes
 from eventsourcing.aggregates import load_editable_aggregates_at_time
 from eventsourcing.aggregates import load_editable_aggregates_at_time_and_point
 from eventsourcing.aggregates import reapply_downstream_events_from
+from eventsourcing.aggregates import reapply_downstream_events_from_many
 from winemaking.models import Action
 from winemaking.models import BottleData
 from winemaking.models import WineLot
 from winemaking.types import ActionType
+from winemaking.use_cases._backdating import BACKDATING_MARGIN
+from winemaking.use_cases._backdating import ONE_SECOND
 
 
 @store_aggregate_changes
 def record_bottle_volume(lot_id: str, volume_bottled: Decimal, bottles: int, effective_at: datetime = None) -> Action:
     if effective_at is not None:
         effective_at = effective_at.replace(microsecond=0)
-        if effective_at > timezone.now() - timedelta(seconds=2):
+        if effective_at > timezone.now() - BACKDATING_MARGIN:
             raise ValueError("Effective date must be functionally in the past if provided.")
 
-    lot = WineLot.objects.filter(id=lot_id).first()
+    lot = AggregateRepository.current().get(WineLot, lot_id)
     if not lot:
         raise ValueError(f"Wine lot with ID {lot_id} does not exist.")
 
     is_backdated = effective_at is not None
 
     if is_backdated:
-        lot = load_editable_aggregates_at_time([lot], occurred_at=effective_at + timedelta(seconds=1))[lot_id]
+        lot = load_editable_aggregates_at_time([lot], occurred_at=effective_at + ONE_SECOND)[lot_id]
 
     action = Action.record_bottle(wine_lot=lot, volume_bottled=volume_bottled, bottles=bottles, effective_at=effective_at)
 
@@ -43,31 +46,34 @@ def record_bottle_volume(lot_id: str, volume_bottled: Decimal, bottles: int, eff
 
 @store_aggregate_changes
 def edit_bottle_volume(action_id: str, lot_id: str, volume_bottled: Decimal, bottles: int) -> Action:
-    action = Action.objects.filter(id=action_id).first()
+    action = AggregateRepository.current().get(Action, action_id)
     if not action:
         raise ValueError(f"Action with ID {action_id} does not exist.")
 
     if action.action_type != ActionType.BOTTLE:
         raise ValueError(f"Action with ID {action_id} is not of type BOTTLE.")
 
-    lot = WineLot.objects.filter(id=lot_id).first()
-    if not lot:
+    # If we are dereferencing a lot, then we need to update it as well, so it is loaded along with the new lot
+    data = cast(BottleData, action.details.data)
+    lots = AggregateRepository.current().get_many(WineLot, dict.fromkeys([lot_id, data.wine_lot_id]))
+    if lot_id not in lots:
         raise ValueError(f"Wine lot with ID {lot_id} does not exist.")
 
-    # If we are dereferencing a lot, then we need to update it as well
-    lots = [lot]
-    if lot.id != action.details.data.wine_lot_id:
-        old_lot = WineLot.objects.filter(id=action.details.data.wine_lot_id).first()
-        lots.append(old_lot)
+    # An edit that does not change the action, such as a retried edit, does not change the lots either, so nothing needs to
+    # be replayed once the action is known to be editable.
+    action.check_editable(ActionType.BOTTLE)
+    if data.wine_lot_id == lot_id and data.volume_bottled == volume_bottled and data.bottles == bottles:
+        return action
 
-    lots_by_id = load_editable_aggregates_at_time_and_point(lots, occurred_at=action.effective_at, sequence_number=action.id)
+    lots_by_id = load_editable_aggregates_at_time_and_point(
+        lots.values(), occurred_at=action.effective_at, sequence_number=action.id
+    )
 
-    action.edit_bottle(wine_lot=lots_by_id[lot.id], volume_bottled=volume_bottled, bottles=bottles)
+    action.edit_bottle(wine_lot=lots_by_id[lot_id], volume_bottled=volume_bottled, bottles=bottles)
 
-    _process_action(action, lots_by_id[lot.id])
+    _process_action(action, lots_by_id[lot_id])
 
-    for to_replay in lots_by_id.values():
-        reapply_downstream_events_from(aggregate=to_replay, occurred_at=action.effective_at, sequence_number=action.id)
+    reapply_downstream_events_from_many(lots_by_id.values(), occurred_at=action.effective_at, sequence_number=action.id)
 
     return action
 
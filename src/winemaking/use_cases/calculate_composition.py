@@ -1,14 +1,24 @@
+from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
+from typing import Iterator
 from typing import cast
 
+from django.db import connections
 from django.db.models import Q
+from django.db.models import QuerySet
 
 from winemaking.events.wine_lot import VolumeBlended
 from winemaking.events.wine_lot import WineLotEventType
 from winemaking.models import WineLot
 from winemaking.models import WineLotEventStore
 from winemaking.types import Composition
+from winemaking.types import LotComponent
+
+_ZERO = Decimal("0")
+"""The starting amount of volume and of each component when blending, shared rather than created for every addition."""
+
+_ONE = Decimal("1")
 
 
 def calculate_composition(lot_id: str, effective_at: datetime | None = None, action_id: str | None = None) -> Composition:
@@ -48,118 +58,187 @@ def calculate_composition(lot_id: str, effective_at: datetime | None = None, act
     if action_id is not None and effective_at is None:
         raise ValueError("effective_at must be provided when action_id is specified.")
 
-    lot = WineLot.objects.filter(id=lot_id).first()
-
-    if not lot:
+    if not WineLot.objects.filter(id=lot_id).exists():
         raise ValueError(f"Wine lot with ID {lot_id} does not exist.")
 
-    lot_ids = _get_all_lot_ids(lot_id, effective_at=effective_at, action_id=action_id)
+    events = _get_all_lot_events(lot_id, effective_at=effective_at, action_id=action_id)
 
-    lot_compositions = _build_lot_compositions(lot_ids, effective_at=effective_at, action_id=action_id)
+    lot_compositions = _build_lot_compositions(events)
 
-    return lot_compositions[lot_id]
-
-
-def _build_lot_compositions(
-    lot_ids: set[str],
-    effective_at: datetime | None = None,
-    action_id: str | None = None,
-) -> dict[str, Composition]:
-    relevant_events = WineLotEventStore.objects.filter(aggregate_id__in=lot_ids)
+    # The compositions are built without validation while replaying, so the composition of the target lot is validated
+    # once here.
+    return Composition(components=lot_compositions[lot_id].components)
 
-    if effective_at is not None:
-        if action_id is not None:
-            # Before the cutoff time, include all events; at the cutoff time, include only up to the matching action.
-            relevant_events = relevant_events.filter(
-                Q(occurred_at__lt=effective_at) | Q(occurred_at=effective_at, sequence_number__lte=action_id)
-            )
-        else:
-            # Include everything up to and including the cutoff time.
-            relevant_events = relevant_events.filter(occurred_at__lte=effective_at)
 
+def _build_lot_compositions(events: list[tuple]) -> dict[str, Composition]:
+    """
+    Replay the events of the involved lots, as found by `_get_all_lot_events`, building up the composition of each lot.
+    """
     # Now build up the composition for each lot as we go
     lot_compositions: dict[str, Composition] = {}
     lots: dict[str, WineLot] = {}
-    for event in relevant_events:
+    # Lots that share a component each have their own equal instance of it. Using a single instance for each component
+    # lets the dict lookups while blending match keys by identity, rather than calling `LotComponent.__eq__`.
+    shared_components: dict[LotComponent, LotComponent] = {}
+    for *_, aggregate_id, event in events:
         if event.event_type == WineLotEventType.CREATED:
-            lot_compositions[event.aggregate_id] = event.get_event_data().composition
+            lot_compositions[aggregate_id] = Composition.model_construct(
+                components={shared_components.setdefault(comp, comp): pct for comp, pct in event.composition.components.items()}
+            )
             lot = WineLot()
-            lot.load(event.get_event_data())
-            lots[event.aggregate_id] = lot
+            lot.load(event)
+            lots[aggregate_id] = lot
             continue
 
-        lot = lots[event.aggregate_id]
+        lot = lots[aggregate_id]
         if event.event_type == WineLotEventType.VOLUME_BLENDED:
-            event_data = cast(VolumeBlended, event.get_event_data())
-            lot_composition = lot_compositions[event.aggregate_id]
+            event_data = cast(VolumeBlended, event)
+            lot_composition = lot_compositions[aggregate_id]
             lot_volume = lot.volume
 
             # Each of `volumes` is a different lot that is being blended into `lot` by volume. This should update
             # the final composition of `lot` based on the blended volumes.
-            blended_total = sum(event_data.volumes.values(), start=Decimal("0"))
+            blended_total = sum(event_data.volumes.values(), start=_ZERO)
             new_total_volume = lot_volume + blended_total
 
-            new_components = {}
+            # Every weight is a volume over the new total volume, so the total is only divided into once.
+            inverse_total_volume = _ONE / new_total_volume
+
+            new_components: defaultdict[LotComponent, Decimal] = defaultdict(lambda: _ZERO)
 
-            # Contribution from the existing lot contents
+            # Contribution from the existing lot contents, which are the first to be added so need no accumulating
             if lot_volume > 0:
-                current_weight = lot_volume / new_total_volume
+                current_weight = lot_volume * inverse_total_volume
                 for comp, pct in lot_composition.components.items():
-                    new_components[comp] = new_components.get(comp, Decimal("0")) + pct * current_weight
+                    new_components[comp] = pct * current_weight
 
             # Contributions from each blended-in lot
             for blended_lot_id, blend_volume in event_data.volumes.items():
                 if blend_volume <= 0:
                     continue
-                blend_weight = blend_volume / new_total_volume
+                blend_weight = blend_volume * inverse_total_volume
                 blend_composition = lot_compositions[blended_lot_id]
                 for comp, pct in blend_composition.components.items():
-                    new_components[comp] = new_components.get(comp, Decimal("0")) + pct * blend_weight
+                    new_components[comp] += pct * blend_weight
 
-            new_composition = Composition(components=new_components)
+            # The weighted average keeps the percentages summing to one, so they are not validated for every blend.
+            new_composition = Composition.model_construct(components=dict(new_components))
 
-            lot_compositions[event.aggregate_id] = new_composition
+            lot_compositions[aggregate_id] = new_composition
 
         # Update the state of the lot before moving on
-        lot.load(event.get_event_data())
+        lot.load(event)
 
     return lot_compositions
 
 
-def _get_all_lot_ids(
+def _get_all_lot_events(
     lot_id: str,
     effective_at: datetime | None = None,
     action_id: str | None = None,
-) -> set[str]:
+) -> list[tuple]:
     """
-    Iteratively find all lot IDs that are involved in the calculation of the target lot composition,
-    constrained to blend events up to an optional cutoff.
+    Find the events of all lots that are involved in the calculation of the target lot composition, constrained to
+    events up to an optional cutoff, returning them in stream order.
 
-    This performs a breadth-first search, because each of the lots that are directly blended into the target lot may
-    have blends into them as well.
+    Each of the lots that are directly blended into the target lot may have blends into them as well, so the lots are
+    found by following the blend events upstream. On PostgreSQL the whole search is done by the database in a single
+    query, and only the created event of the target lot is returned if nothing has been blended into it. Otherwise the
+    search is done level by level in Python.
+
+    Each event is returned as a tuple of its occurred at time, sequence number, ID, aggregate ID, and validated event.
+    """
+    lot_events = WineLotEventStore.objects.all()
+
+    if effective_at is not None:
+        if action_id is not None:
+            # Before the cutoff time, include all events; at the cutoff time, include only up to the matching action.
+            lot_events = lot_events.filter(
+                Q(occurred_at__lt=effective_at) | Q(occurred_at=effective_at, sequence_number__lte=action_id)
+            )
+        else:
+            # Include everything up to and including the cutoff time.
+            lot_events = lot_events.filter(occurred_at__lte=effective_at)
+
+    if connections[lot_events.db].vendor == "postgresql":
+        lot_ids = _get_upstream_lot_ids(lot_events, lot_id)
+        if lot_ids == [lot_id]:
+            # Nothing has been blended into the lot, so its composition is the one it was created with, and none of its
+            # other events need to be read.
+            lot_events = lot_events.filter(event_type=WineLotEventType.CREATED)
+        events = list(_read_lot_events(lot_events.filter(aggregate_id__in=lot_ids)))
+    else:
+        events = _search_lot_events(lot_events, lot_id)
+
+    # Replay in the order of the event store: by occurred at time, then sequence number with missing ones first, then ID.
+    events.sort(key=lambda e: (e[0], e[1] is not None, e[1] or "", e[2]))
+
+    return events
+
+
+def _get_upstream_lot_ids(lot_events: QuerySet, lot_id: str) -> list[str]:
+    """
+    Find the target lot and all lots upstream of it with a recursive query over the blend events within the cutoff.
+    """
+    blend_events = lot_events.filter(event_type=WineLotEventType.VOLUME_BLENDED).order_by().values("aggregate_id", "event_data")
+    blend_events_sql, params = blend_events.query.sql_with_params()
+
+    # UNION rather than UNION ALL stops the search at lots that have already been found.
+    with connections[blend_events.db].cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH RECURSIVE blend_events AS ({blend_events_sql}), upstream(lot_id) AS (
+                SELECT %s::text
+                UNION
+                SELECT source.lot_id
+                FROM blend_events
+                JOIN upstream ON blend_events.aggregate_id = upstream.lot_id
+                CROSS JOIN LATERAL jsonb_object_keys(blend_events.event_data -> 'volumes') AS source(lot_id)
+            )
+            SELECT lot_id FROM upstream
+            """,
+            (*params, lot_id),
+        )
+        return [lot_id for (lot_id,) in cursor.fetchall()]
+
+
+def _search_lot_events(lot_events: QuerySet, lot_id: str) -> list[tuple]:
+    """
+    Find the events of the target lot and all lots upstream of it with a breadth-first search.
+
+    Each level of the search is found with a single query for the events of every lot in it, and the lots blended into
+    them are discovered from their blend events, so the events are only read once.
     """
     discovered: set[str] = {lot_id}
-    queue: list[str] = [lot_id]
-
-    while queue:
-        current = queue.pop(0)
-
-        # Find all blend events where this lot received volume from other lots
-        blend_events = WineLotEventStore.objects.filter(aggregate_id=current, event_type=WineLotEventType.VOLUME_BLENDED)
-
-        if effective_at is not None:
-            if action_id is not None:
-                blend_events = blend_events.filter(
-                    Q(occurred_at__lt=effective_at) | Q(occurred_at=effective_at, sequence_number__lte=action_id)
-                )
-            else:
-                blend_events = blend_events.filter(occurred_at__lte=effective_at)
-
-        for event in blend_events:
-            event_data = cast(VolumeBlended, event.get_event_data())
-            for source_lot_id in event_data.volumes.keys():
-                if source_lot_id not in discovered:
-                    discovered.add(source_lot_id)
-                    queue.append(source_lot_id)
-
-    return discovered
+    frontier: list[str] = [lot_id]
+    events: list[tuple] = []
+
+    while frontier:
+        level_events = list(_read_lot_events(lot_events.filter(aggregate_id__in=frontier)))
+        events.extend(level_events)
+
+        # Find the lots this level received volume from
+        frontier = []
+        for *_, event in level_events:
+            if event.event_type == WineLotEventType.VOLUME_BLENDED:
+                for source_lot_id in cast(VolumeBlended, event).volumes:
+                    if source_lot_id not in discovered:
+                        discovered.add(source_lot_id)
+                        frontier.append(source_lot_id)
+
+    return events
+
+
+def _read_lot_events(lot_events: QuerySet) -> Iterator[tuple]:
+    """
+    Read and validate the events, in no particular order.
+    """
+    # The events are sorted together once they have all been read, so the database does not need to sort them. The rows
+    # are streamed rather than cached on the queryset, as only the parsed events are kept.
+    rows = (
+        lot_events.order_by()
+        .values_list("occurred_at", "sequence_number", "pk", "aggregate_id", "event_type", WineLotEventStore.event_data_json())
+        .iterator(chunk_size=2000)
+    )
+    for occurred_at, sequence_number, pk, aggregate_id, event_type, event_data in rows:
+        yield occurred_at, sequence_number, pk, aggregate_id, WineLotEventStore.parse_event_data(event_type, event_data)